@@ -0,0 +1,82 @@
+# botdb.py
+# Database access for the bot's hot path. Every query and commit StatsBot
+# makes runs on a small dedicated thread pool against its own engine and
+# connection pool, so a slow database never blocks the event loop (and with
+# it chat handling) and never competes with the Flask dashboard for
+# connections. The event loop only awaits results.
+#
+#   rows = await botdb.run(fn, *args)    # fn(session, *args) in a worker thread
+
+import os, asyncio, functools
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from resilience import Dependency, DB_CALL_TIMEOUT
+
+BOT_DB_WORKERS      = int(os.getenv("BOT_DB_WORKERS", 4))        # threads == max concurrent DB calls
+BOT_DB_POOL_SIZE    = int(os.getenv("BOT_DB_POOL_SIZE", 4))
+BOT_DB_MAX_OVERFLOW = int(os.getenv("BOT_DB_MAX_OVERFLOW", 2))
+BOT_DB_POOL_TIMEOUT = float(os.getenv("BOT_DB_POOL_TIMEOUT", 5))  # seconds to wait for a connection
+BOT_DB_POOL_RECYCLE = int(os.getenv("BOT_DB_POOL_RECYCLE", 1800))
+
+
+def dialect_insert(session, table):
+    """INSERT for *table* with ``on_conflict_do_update`` on the session's backend."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise Exception(f"upsert not supported on {dialect}")
+    return insert(table)
+
+
+class BotDB:
+    """Engine + sessionmaker + executor owned by one StatsBot instance.
+
+    ``run(fn, *args)`` calls ``fn(session, *args)`` on a worker thread with a
+    fresh session (closed afterwards; ``fn`` commits what it writes) under
+    the db timeout, retries and circuit breaker. Rows returned from ``fn``
+    stay readable after the session is gone (``expire_on_commit=False``).
+    """
+
+    def __init__(self, uri: str, workers: int = BOT_DB_WORKERS):
+        engine_kw = {"pool_pre_ping": True}
+        if make_url(uri).get_backend_name() != "sqlite":
+            engine_kw.update(
+                pool_size    = BOT_DB_POOL_SIZE,
+                max_overflow = BOT_DB_MAX_OVERFLOW,
+                pool_timeout = BOT_DB_POOL_TIMEOUT,
+                pool_recycle = BOT_DB_POOL_RECYCLE,
+            )
+        self.engine   = create_engine(uri, **engine_kw)
+        self.Session  = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="botdb")
+        self.dependency = Dependency(
+            "db", timeout=DB_CALL_TIMEOUT, retry_timeouts=False,
+            transient=lambda e: isinstance(e, OperationalError),
+        )
+
+    async def run(self, fn, *args, **kwargs):
+        return await self.dependency.call(self._submit, fn, *args, **kwargs)
+
+    def _submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(self._call, fn, *args, **kwargs)
+        )
+
+    def _call(self, fn, *args, **kwargs):
+        with self.Session() as session:
+            try:
+                return fn(session, *args, **kwargs)
+            except Exception:
+                session.rollback()
+                raise
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.engine.dispose()
@@ -0,0 +1,164 @@
+# broadcaster_cache.py
+# Two-level (memory + broadcaster_meta table) cache of per-broadcaster Helix
+# metadata: login → id, profile and tags. Broadcaster ids never change and
+# tags rarely do, so stream starts and bot restarts should almost never have
+# to ask Helix for them again.
+
+import os, asyncio
+from datetime import datetime, timedelta
+
+from models import BroadcasterMeta
+from helix import PRIORITY_META
+
+# ───────────────────────────  TTLs  ──────────────────────────────────────────
+# Soft TTL: past it the cached value is still served, and a background
+# refresh is started (stale-while-revalidate).
+# Hard TTL: past it the value is treated as missing and fetched inline.
+PROFILE_TTL    = timedelta(seconds=int(os.getenv("META_PROFILE_TTL", 24 * 3600)))
+TAGS_TTL       = timedelta(seconds=int(os.getenv("META_TAGS_TTL", 3600)))
+TAGS_MAX_STALE = timedelta(seconds=int(os.getenv("META_TAGS_MAX_STALE", 7 * 24 * 3600)))
+
+_FIELDS = ("broadcaster_id", "display_name", "profile_image_url", "tags",
+           "user_fetched_at", "tags_fetched_at")
+
+
+class BroadcasterCache:
+    """Login-keyed metadata cache backed by the broadcaster_meta table.
+
+    The table is read once, on first use. Every Helix lookup goes through
+    ``helix`` with PRIORITY_META and the result is written back to the table
+    through ``botdb``.
+    """
+
+    def __init__(self, helix, botdb):
+        self.helix    = helix
+        self.botdb    = botdb
+        self._entries: dict[str, dict] = {}
+        self._loaded  = False
+        self._load_lock = asyncio.Lock()
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+    # ─────────────────────────  PERSISTENCE  ───────────────────────────────
+    async def _load(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            stored = await self.botdb.run(self._read_all)
+            for login, row in stored.items():
+                # anything observed while the table was being read is newer
+                entry = self._entry(login)
+                for f in _FIELDS:
+                    if entry[f] is None:
+                        entry[f] = row[f]
+            self._loaded = True
+
+    async def _persist(self, logins):
+        rows = {login: dict(self._entries[login]) for login in logins}
+        try:
+            await self.botdb.run(self._write, rows)
+        except Exception as e:
+            print(f"[meta] failed to persist {', '.join(logins)}: {e}")
+
+    @staticmethod
+    def _read_all(session) -> dict[str, dict]:
+        return {
+            row.login: {f: getattr(row, f) for f in _FIELDS}
+            for row in session.query(BroadcasterMeta).all()
+        }
+
+    @staticmethod
+    def _write(session, rows: dict[str, dict]):
+        for login, entry in rows.items():
+            session.merge(BroadcasterMeta(login=login, **entry))
+        session.commit()
+
+    def _entry(self, login: str) -> dict:
+        return self._entries.setdefault(login, dict.fromkeys(_FIELDS))
+
+    # ─────────────────────────  HELIX REFRESH  ─────────────────────────────
+    async def _fetch_users(self, logins: list[str]):
+        now = datetime.utcnow()
+        for u in await self.helix.get_users(logins, priority=PRIORITY_META):
+            entry = self._entry(u["login"].lower())
+            entry.update(
+                broadcaster_id    = u["id"],
+                display_name      = u.get("display_name"),
+                profile_image_url = u.get("profile_image_url"),
+                user_fetched_at   = now,
+            )
+        await self._persist([l for l in logins if l in self._entries])
+
+    async def _fetch_tags(self, login: str):
+        entry = self._entry(login)
+        if not entry["broadcaster_id"]:
+            # e.g. a session resumed after a restart: nothing observed the id yet
+            await self.resolve([login])
+            if not entry["broadcaster_id"]:
+                return
+        entry["tags"] = await self.helix.fetch_stream_tags(entry["broadcaster_id"])
+        entry["tags_fetched_at"] = datetime.utcnow()
+        await self._persist([login])
+
+    def _revalidate(self, key: tuple[str, str], coro_fn, *args):
+        """Run *coro_fn* in the background unless the same refresh is already running."""
+        task = self._inflight.get(key)
+        if task and not task.done():
+            return
+
+        async def _run():
+            try:
+                await coro_fn(*args)
+            except Exception as e:
+                print(f"[meta] background refresh {key} failed: {e}")
+            finally:
+                self._inflight.pop(key, None)
+
+        self._inflight[key] = asyncio.create_task(_run())
+
+    # ─────────────────────────  PUBLIC API  ────────────────────────────────
+    def observe(self, login: str, broadcaster_id: str):
+        """Record an id seen for free in a streams payload (persisted in the background)."""
+        entry = self._entry(login)
+        if entry["broadcaster_id"] != str(broadcaster_id):
+            entry["broadcaster_id"] = str(broadcaster_id)
+            self._revalidate(("persist", login), self._persist, [login])
+
+    async def resolve(self, logins: list[str]) -> dict[str, dict]:
+        """Cached metadata for each login; only unknown ids are fetched inline."""
+        await self._load()
+        now      = datetime.utcnow()
+        missing  = [l for l in logins if not self._entry(l)["broadcaster_id"]]
+        if missing:
+            await self._fetch_users(missing)
+
+        stale = [
+            l for l in logins
+            if l not in missing and (
+                self._entries[l]["user_fetched_at"] is None
+                or now - self._entries[l]["user_fetched_at"] > PROFILE_TTL
+            )
+        ]
+        if stale:
+            self._revalidate(("users", ",".join(sorted(stale))), self._fetch_users, stale)
+
+        return {l: self._entries[l] for l in logins if self._entries[l]["broadcaster_id"]}
+
+    async def tags(self, login: str) -> list[str]:
+        """Stream tags for *login*, served from cache while within TAGS_MAX_STALE."""
+        await self._load()
+        entry   = self._entry(login)
+        fetched = entry["tags_fetched_at"]
+        age     = datetime.utcnow() - fetched if fetched else None
+
+        if age is None or age > TAGS_MAX_STALE:
+            await self._fetch_tags(login)
+        elif age > TAGS_TTL:
+            self._revalidate(("tags", login), self._fetch_tags, login)
+        return list(entry["tags"] or [])
+
+    def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self._inflight.clear()
@@ -1,12 +1,18 @@
 # dashboard.py – multi-channel version (updated)
 
-from datetime import datetime                    # ⬅ NEW
+import os, pytz
+from datetime import datetime, timedelta         # ⬅ NEW
 from flask import Blueprint, jsonify, render_template_string, request
-from sqlalchemy import func
-from models import DailyStats
+from db import db
+from models import DailyStats, LatestSnapshot
 
 dash = Blueprint("dash", __name__)
 
+EST = pytz.timezone("US/Eastern")
+# a live_stream_latest row older than this is taken as an ended stream; above
+# the snapshot heartbeat, since unchanged snapshots aren't written until then
+LIVE_MAX_AGE = float(os.getenv("LIVE_MAX_AGE", 20 * 60))   # seconds
+
 # ─── SAME KEYS LIST AS BEFORE ──────────────────────────────────────────────────
 KEYS = [
     "stream_date","stream_start_time",
@@ -36,8 +42,21 @@ def dump_stats(row: "DailyStats") -> dict:
     d["stream_date"]       = str(d["stream_date"])
     d["stream_start_time"] = d["stream_start_time"].strftime("%H:%M")
     d["stream_name"]       = row.stream_name
+    d["stream_id"]         = row.stream_id
     return d
 
+def live_snapshot(channel: str, stream_id: int | None = None) -> "LatestSnapshot | None":
+    """The channel's newest snapshot from live_stream_latest while its stream
+    still looks live: written recently and not yet rolled up to daily_stats."""
+    row = db.session.get(LatestSnapshot, channel)
+    if row is None or (stream_id is not None and row.stream_id != stream_id):
+        return None
+    if row.snapshot_time < datetime.now(EST).replace(tzinfo=None) - timedelta(seconds=LIVE_MAX_AGE):
+        return None
+    if row.stream_id is not None and db.session.query(DailyStats.id).filter_by(stream_id=row.stream_id).first():
+        return None
+    return row
+
 # ───────────────────────────────────────────────────────────────────────────────
 #  A. Channels list (unchanged)
 # ───────────────────────────────────────────────────────────────────────────────
@@ -84,6 +103,7 @@ def api_live():
 
     channel = request.args.get("channel", "").strip().lower()
     live_only = request.args.get("liveOnly") == "1"   # NEW    
+    stream_id = request.args.get("stream", type=int)  # one session, by Twitch stream id
     # print(f">>> [dashboard] api_live called for channel='{channel}'")
     # ─── 1️⃣ In-memory live stats ─────────────────────────────────────────
 
@@ -102,6 +122,8 @@ def api_live():
     }
 
     stats = live_map.get(channel)
+    if stats and stream_id is not None and stats.get("stream_id") != stream_id:
+        stats = None
     if stats:
         payload = {}
         for k in KEYS:
@@ -114,19 +136,33 @@ def api_live():
             else:
                 payload[k] = _serialisable(stats.get(k))
         payload["stream_name"] = channel
+        payload["stream_id"]   = stats.get("stream_id")
+        return jsonify(payload)
+
+    # not live in this process (e.g. the dashboard runs apart from the bot):
+    # the bot's newest snapshot of the channel
+    row = live_snapshot(channel, stream_id)
+    if row:
+        payload = {k: _serialisable(getattr(row, k, None)) for k in KEYS}
+        payload["stream_start_time"] = row.stream_start_time.strftime("%H:%M")
+        payload["stream_name"]       = channel
+        payload["stream_id"]         = row.stream_id
         return jsonify(payload)
 
     if live_only:
       return jsonify({"error": "offline"}), 404     # <-- NEW
   
     # 2️⃣ Fall back to the latest DB row if nothing live
-    row = (
-        DailyStats.query
-        .filter(func.lower(DailyStats.stream_name) == channel)
-        .order_by(DailyStats.stream_date.desc(),
-                  DailyStats.stream_start_time.desc())
-        .first()
-    )
+    if stream_id is not None:
+        row = DailyStats.query.filter_by(stream_id=stream_id).first()
+    else:
+        row = (
+            DailyStats.query
+            .filter(DailyStats.stream_name_lc == channel)
+            .order_by(DailyStats.stream_date.desc(),
+                      DailyStats.stream_start_time.desc())
+            .first()
+        )
     if not row:
         return jsonify({"error": "no data yet"}), 404
     return jsonify(dump_stats(row))
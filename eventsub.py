@@ -0,0 +1,208 @@
+# eventsub.py
+# EventSub over WebSocket: pushes stream.online, stream.offline and
+# channel.follow for the watched channels so StatsBot doesn't have to infer
+# them by polling. Polling stays on as a slower reconciliation fallback.
+#
+# Point EVENTSUB_WS_URL / EVENTSUB_API_URL at eventsub_mock.py to run the
+# whole flow offline.
+
+import os, json, asyncio, aiohttp
+from collections import OrderedDict
+
+EVENTSUB_WS_URL   = os.getenv("EVENTSUB_WS_URL", "wss://eventsub.wss.twitch.tv/ws")
+EVENTSUB_ENABLED  = os.getenv("EVENTSUB_ENABLED", "1") == "1"
+KEEPALIVE_GRACE   = 5          # seconds on top of keepalive_timeout_seconds
+WELCOME_TIMEOUT   = 10
+SEEN_MESSAGE_IDS  = 1000       # dedupe window for redelivered messages
+
+# (type, version, needs a moderator id in the condition)
+SUBSCRIPTIONS = (
+    ("stream.online",  "1", False),
+    ("stream.offline", "1", False),
+    ("channel.follow", "2", True),
+)
+
+
+class EventSubClient:
+    """One EventSub WebSocket session plus its subscriptions.
+
+    ``handlers`` maps a subscription type to an ``async def(event)``
+    callback; each notification runs in its own task, so a slow handler
+    never holds up the socket's keepalives. ``watch()`` sets the broadcasters to subscribe for; it can be
+    called before or after ``start()``. ``covered(type)`` returns the logins
+    that currently have a live subscription of that type, so callers can
+    relax polling for them.
+    """
+
+    def __init__(self, helix, handlers: dict, url: str = EVENTSUB_WS_URL):
+        self.helix        = helix
+        self.handlers     = handlers
+        self.url          = url
+        self.moderator_id: str | None = None
+        self.session_id:   str | None = None
+        self._keepalive   = 10
+        self._task:       asyncio.Task | None = None
+        self._sub_task:   asyncio.Task | None = None
+        self._handling:   set[asyncio.Task] = set()           # running handlers
+        self._watched:    dict[str, str] = {}                 # login → broadcaster id
+        self._active:     dict[str, set[str]] = {}            # type → logins
+        self._refused:    set[tuple[str, str]] = set()        # (type, login) we may not subscribe to
+        self._seen:       OrderedDict[str, None] = OrderedDict()
+
+    # ─────────────────────────  PUBLIC API  ────────────────────────────────
+    def covered(self, sub_type: str) -> set[str]:
+        return set(self._active.get(sub_type, ())) if self.session_id else set()
+
+    def watch(self, broadcasters: dict[str, str], moderator_id: str | None = None):
+        self._watched.update(broadcasters)
+        if moderator_id:
+            self.moderator_id = str(moderator_id)
+        if self.session_id:
+            self._spawn_subscribe()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        for task in (self._sub_task, self._task, *self._handling):
+            if task and not task.done():
+                task.cancel()
+        self._task = self._sub_task = None
+        self.session_id = None
+
+    # ─────────────────────────  CONNECTION  ────────────────────────────────
+    async def _run(self):
+        backoff = 1
+        ws = None
+        while True:
+            try:
+                if ws is None:
+                    ws = await self._open(self.url)
+                    self._active.clear()
+                    self._spawn_subscribe()
+                ws = await self._read(ws)
+                backoff = 1
+            except asyncio.CancelledError:
+                if ws is not None:
+                    await ws.close()
+                raise
+            except Exception as e:
+                print(f"[eventsub] connection lost: {type(e).__name__}: {e}")
+                if ws is not None and not ws.closed:
+                    await ws.close()
+                ws = None
+                self.session_id = None
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 300)
+
+    async def _open(self, url: str):
+        ws = await self.helix.session.ws_connect(url, heartbeat=None)
+        try:
+            msg = json.loads((await ws.receive(timeout=WELCOME_TIMEOUT)).data)
+            if msg["metadata"]["message_type"] != "session_welcome":
+                raise ConnectionError(f"expected session_welcome, got {msg['metadata']['message_type']}")
+        except BaseException:
+            await ws.close()
+            raise
+        session = msg["payload"]["session"]
+        self.session_id = session["id"]
+        self._keepalive = session.get("keepalive_timeout_seconds") or self._keepalive
+        print(f"[eventsub] session {self.session_id} connected")
+        return ws
+
+    async def _read(self, ws):
+        """Read until the socket dies (raises) or Twitch asks us to move (returns the new socket)."""
+        while True:
+            raw = await ws.receive(timeout=self._keepalive + KEEPALIVE_GRACE)
+            if raw.type != aiohttp.WSMsgType.TEXT:
+                raise ConnectionError(f"socket closed ({raw.type.name}, code={ws.close_code})")
+
+            msg  = json.loads(raw.data)
+            meta = msg["metadata"]
+            kind = meta["message_type"]
+
+            if kind == "session_keepalive":
+                continue
+            if kind == "session_reconnect":
+                # connect to the new URL before dropping the old socket so
+                # the existing subscriptions carry over
+                new_ws = await self._open(msg["payload"]["session"]["reconnect_url"])
+                await ws.close()
+                return new_ws
+            if kind == "revocation":
+                sub = msg["payload"]["subscription"]
+                print(f"[eventsub] {sub['type']} revoked: {sub.get('status')}")
+                self._forget(sub)
+                continue
+            if kind == "notification":
+                if meta["message_id"] in self._seen:
+                    continue
+                self._seen[meta["message_id"]] = None
+                while len(self._seen) > SEEN_MESSAGE_IDS:
+                    self._seen.popitem(last=False)
+                task = asyncio.create_task(
+                    self._dispatch(meta["subscription_type"], msg["payload"]["event"])
+                )
+                self._handling.add(task)
+                task.add_done_callback(self._handling.discard)
+
+    async def _dispatch(self, sub_type: str, event: dict):
+        handler = self.handlers.get(sub_type)
+        if handler is None:
+            return
+        try:
+            await handler(event)
+        except Exception as e:
+            import traceback
+            print(f"[eventsub] {sub_type} handler failed: {type(e).__name__}: {e}")
+            traceback.print_exc()
+
+    def _forget(self, sub: dict):
+        bid = sub.get("condition", {}).get("broadcaster_user_id")
+        for login, watched_id in self._watched.items():
+            if watched_id == bid:
+                self._active.get(sub["type"], set()).discard(login)
+
+    # ─────────────────────────  SUBSCRIPTIONS  ─────────────────────────────
+    def _spawn_subscribe(self):
+        if self._sub_task is None or self._sub_task.done():
+            self._sub_task = asyncio.create_task(self._subscribe_all())
+
+    async def _subscribe_all(self):
+        """Create every missing (type, broadcaster) subscription on the current session."""
+        while True:
+            session_id = self.session_id
+            pending = [
+                (sub_type, version, needs_mod, login, bid)
+                for login, bid in self._watched.items()
+                for sub_type, version, needs_mod in SUBSCRIPTIONS
+                if login not in self._active.get(sub_type, ())
+                and (sub_type, login) not in self._refused
+                and (self.moderator_id or not needs_mod)
+            ]
+            if not pending or session_id is None:
+                return
+            for sub_type, version, needs_mod, login, bid in pending:
+                if self.session_id != session_id:
+                    break                   # reconnected – start over on the new session
+                condition = {"broadcaster_user_id": bid}
+                if needs_mod:
+                    condition["moderator_user_id"] = self.moderator_id
+                try:
+                    await self.helix.create_eventsub_subscription(
+                        sub_type, version, condition, session_id
+                    )
+                except aiohttp.ClientResponseError as e:
+                    if e.status == 409:     # already exists on this session
+                        pass
+                    elif e.status in (400, 403):
+                        # e.g. channel.follow where the bot is not a moderator
+                        self._refused.add((sub_type, login))
+                        continue
+                    else:
+                        print(f"[eventsub] {sub_type} for {login} failed: {e.status} {e.message}")
+                        continue
+                self._active.setdefault(sub_type, set()).add(login)
+            else:
+                return
@@ -0,0 +1,153 @@
+# eventsub_mock.py
+# Local stand-in for Twitch's EventSub WebSocket + subscriptions endpoint so
+# the push path in eventsub.py can be exercised offline.
+#
+#   python eventsub_mock.py --port 8081
+#   EVENTSUB_WS_URL=ws://127.0.0.1:8081/ws \
+#   EVENTSUB_API_URL=http://127.0.0.1:8081/eventsub/subscriptions python main.py
+#
+# Fire events at every connected session:
+#   curl -X POST "http://127.0.0.1:8081/trigger?type=stream.online&login=momodog&id=123"
+#   curl -X POST "http://127.0.0.1:8081/trigger?type=stream.offline&login=momodog&id=123"
+#   curl -X POST "http://127.0.0.1:8081/trigger?type=channel.follow&login=momodog&id=123"
+#   curl -X POST "http://127.0.0.1:8081/reconnect"
+
+import argparse, asyncio, uuid
+from datetime import datetime, timezone
+from aiohttp import web
+
+KEEPALIVE_SECONDS = 10
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _message(message_type: str, payload: dict, subscription: dict | None = None) -> dict:
+    metadata = {
+        "message_id":        str(uuid.uuid4()),
+        "message_type":      message_type,
+        "message_timestamp": _now(),
+    }
+    if subscription:
+        metadata["subscription_type"]    = subscription["type"]
+        metadata["subscription_version"] = subscription["version"]
+    return {"metadata": metadata, "payload": payload}
+
+
+def _event(sub_type: str, login: str, broadcaster_id: str) -> dict:
+    event = {
+        "broadcaster_user_id":    broadcaster_id,
+        "broadcaster_user_login": login,
+        "broadcaster_user_name":  login,
+    }
+    if sub_type == "stream.online":
+        event.update(id=str(uuid.uuid4().int)[:11], type="live", started_at=_now())
+    elif sub_type == "channel.follow":
+        event.update(user_id="1", user_login="mock_follower", user_name="Mock_Follower",
+                     followed_at=_now())
+    return event
+
+
+class MockEventSub:
+    def __init__(self, keepalive: int = KEEPALIVE_SECONDS):
+        self.keepalive     = keepalive
+        self.sessions:      dict[str, web.WebSocketResponse] = {}
+        self.subscriptions: list[dict] = []
+
+    # ─────────────────────────  WEBSOCKET  ─────────────────────────────────
+    async def ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session_id = request.query.get("session") or str(uuid.uuid4())
+        self.sessions[session_id] = ws
+        await ws.send_json(_message("session_welcome", {"session": {
+            "id":                        session_id,
+            "status":                    "connected",
+            "connected_at":              _now(),
+            "keepalive_timeout_seconds": self.keepalive,
+            "reconnect_url":             None,
+        }}))
+
+        async def _keepalive():
+            while not ws.closed:
+                await asyncio.sleep(self.keepalive)
+                await ws.send_json(_message("session_keepalive", {}))
+
+        task = asyncio.create_task(_keepalive())
+        try:
+            async for _ in ws:
+                pass                    # clients never send anything
+        finally:
+            task.cancel()
+            if self.sessions.get(session_id) is ws:
+                del self.sessions[session_id]
+        return ws
+
+    # ─────────────────────────  HELIX  ─────────────────────────────────────
+    async def subscribe(self, request):
+        body = await request.json()
+        session_id = body.get("transport", {}).get("session_id")
+        if session_id not in self.sessions:
+            return web.json_response({"error": "Bad Request", "status": 400,
+                                      "message": "websocket transport session does not exist"},
+                                     status=400)
+        sub = {
+            "id":         str(uuid.uuid4()),
+            "status":     "enabled",
+            "type":       body["type"],
+            "version":    body["version"],
+            "condition":  body["condition"],
+            "transport":  body["transport"],
+            "created_at": _now(),
+            "cost":       0,
+        }
+        self.subscriptions.append(sub)
+        return web.json_response({"data": [sub], "total": len(self.subscriptions),
+                                  "total_cost": 0, "max_total_cost": 10}, status=202)
+
+    # ─────────────────────────  CONTROL  ───────────────────────────────────
+    async def trigger(self, request):
+        sub_type = request.query["type"]
+        login    = request.query["login"].lower()
+        bid      = request.query.get("id", "0")
+        sent = 0
+        for sub in self.subscriptions:
+            if sub["type"] != sub_type or sub["condition"].get("broadcaster_user_id") != bid:
+                continue
+            ws = self.sessions.get(sub["transport"]["session_id"])
+            if ws is None or ws.closed:
+                continue
+            await ws.send_json(_message("notification",
+                                        {"subscription": sub, "event": _event(sub_type, login, bid)},
+                                        subscription=sub))
+            sent += 1
+        return web.json_response({"sent": sent})
+
+    async def reconnect(self, request):
+        """Ask every session to move to a new socket, as Twitch does before maintenance."""
+        host = request.host
+        for session_id, ws in list(self.sessions.items()):
+            await ws.send_json(_message("session_reconnect", {"session": {
+                "id":            session_id,
+                "status":        "reconnecting",
+                "reconnect_url": f"ws://{host}/ws?session={session_id}",
+            }}))
+        return web.json_response({"sessions": len(self.sessions)})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/ws", self.ws)
+        app.router.add_post("/eventsub/subscriptions", self.subscribe)
+        app.router.add_post("/trigger", self.trigger)
+        app.router.add_post("/reconnect", self.reconnect)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Twitch EventSub WebSocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--keepalive", type=int, default=KEEPALIVE_SECONDS)
+    args = parser.parse_args()
+    web.run_app(MockEventSub(args.keepalive).app(), host=args.host, port=args.port)
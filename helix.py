@@ -0,0 +1,482 @@
+# helix.py
+# Shared, pooled HTTP client for every Helix / OAuth / keep-alive call made by
+# StatsBot. One aiohttp session (and therefore one TCP/TLS pool) lives for the
+# whole lifetime of the bot instead of a fresh session per request, and every
+# Helix request is paced by the rate-limit-aware scheduler of the credential
+# (app registration) it was sent with.
+
+import os, time, zlib, heapq, itertools, asyncio, aiohttp
+
+from resilience import Dependency
+
+HELIX_URL       = "https://api.twitch.tv/helix"
+TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
+# overridable so the bot can be pointed at eventsub_mock.py
+EVENTSUB_API_URL = os.getenv("EVENTSUB_API_URL", f"{HELIX_URL}/eventsub/subscriptions")
+
+# ───────────────────────────  POOL / TIMEOUT TUNING  ─────────────────────────
+HTTP_POOL_LIMIT          = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_DNS_CACHE_TTL       = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))       # seconds
+HTTP_KEEPALIVE_TIMEOUT   = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 75))  # seconds
+HTTP_TIMEOUT_TOTAL       = float(os.getenv("HTTP_TIMEOUT_TOTAL", 20))
+HTTP_TIMEOUT_CONNECT     = float(os.getenv("HTTP_TIMEOUT_CONNECT", 5))
+HTTP_TIMEOUT_SOCK_READ   = float(os.getenv("HTTP_TIMEOUT_SOCK_READ", 10))
+
+# ───────────────────────────  HELIX RATE LIMIT  ──────────────────────────────
+HELIX_RATE_LIMIT = int(os.getenv("HELIX_RATE_LIMIT", 800))   # points per minute
+HELIX_RATE_BURST = int(os.getenv("HELIX_RATE_BURST", 40))    # max points spent at once
+
+# Helix caps user_login / login / id list parameters at 100 per request
+HELIX_MAX_IDS = 100
+
+# refresh the user token this many seconds before Twitch says it expires
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", 300))
+
+# skip a credential for this long after its token refresh failed
+CREDENTIAL_COOLDOWN = int(os.getenv("CREDENTIAL_COOLDOWN", 60))
+
+# request priorities – lower numbers are served first
+PRIORITY_STREAMS = 0    # live / offline detection
+PRIORITY_START   = 1    # stream-start lookups (users, followers_start)
+PRIORITY_POLL    = 2    # per-tick follower refresh
+PRIORITY_META    = 3    # tags and other slow-changing metadata
+
+
+def chunked(items: list, size: int = HELIX_MAX_IDS) -> list[list]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def is_transient(exc: Exception) -> bool:
+    """Network trouble, timeouts, 5xx and leftover 429s – worth a retry."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class HelixRateLimiter:
+    """Token bucket for one credential's Helix calls, kept in sync with Ratelimit-* headers.
+
+    Callers ``await acquire(priority)`` and are released in priority order.
+    The bucket refills continuously at ``limit / 60`` points per second but
+    never holds more than ``burst`` points, so many streams starting in the
+    same tick are spread out instead of draining the minute's budget at once.
+    When Helix reports ``Ratelimit-Remaining: 0`` (or answers 429) every
+    waiter is held until ``Ratelimit-Reset``.
+    """
+
+    def __init__(self, limit: int = HELIX_RATE_LIMIT, burst: int = HELIX_RATE_BURST):
+        self.limit  = limit
+        self.burst  = burst
+        self.tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0               # unix epoch from Ratelimit-Reset
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq  = itertools.count()
+        self._pump: asyncio.Task | None = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.limit / 60.0)
+        self._stamp = now
+
+    @property
+    def available(self) -> float:
+        """Points that could be spent right now."""
+        if time.time() < self._blocked_until:
+            return 0.0
+        self._refill()
+        return self.tokens
+
+    async def acquire(self, priority: int = PRIORITY_POLL):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+        await fut
+
+    async def _run(self):
+        while self._waiters:
+            # skip callers that were cancelled while queued
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = self._blocked_until - time.time()
+            if wait <= 0:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    heapq.heappop(self._waiters)[2].set_result(None)
+                    continue
+                wait = (1 - self.tokens) * 60.0 / self.limit
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Clamp the local budget to what Helix says is actually left."""
+        limit     = headers.get("Ratelimit-Limit")
+        remaining = headers.get("Ratelimit-Remaining")
+        reset     = headers.get("Ratelimit-Reset")
+        if limit:
+            self.limit = max(1, int(limit))
+        if remaining is None:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+        if int(remaining) <= 0 and reset:
+            self._blocked_until = max(self._blocked_until, float(reset))
+
+    def on_rate_limited(self, headers):
+        """A 429 slipped through – empty the bucket until the reported reset."""
+        self._refill()
+        self.tokens = 0.0
+        reset = headers.get("Ratelimit-Reset")
+        self._blocked_until = max(self._blocked_until, float(reset) if reset else time.time() + 1)
+
+    def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        for _, _, fut in self._waiters:
+            if not fut.done():
+                fut.cancel()
+        self._waiters.clear()
+
+
+class TokenManager:
+    """Async, single-flight cache for one credential's access token.
+
+    With a refresh token this is the user token for that registration;
+    without one it falls back to an app access token (client-credentials
+    grant), which is all the read-only Helix endpoints need.
+
+    ``get()`` returns the cached token until it is within
+    TOKEN_REFRESH_MARGIN seconds of expiry, then refreshes it.  Concurrent
+    callers that need a refresh all await the same in-flight request, so a
+    burst of go-lives or 401s produces exactly one call to the token
+    endpoint.  Listeners registered with ``on_refresh`` are called
+    synchronously with ``(access_token, refresh_token)`` right after the
+    cache is updated.
+    """
+
+    def __init__(self, http: "HelixClient", credential: "Credential", refresh_token: str | None):
+        self._http          = http
+        self._cred          = credential
+        self.access_token:  str | None = None
+        self.refresh_token  = refresh_token
+        self.expires_at:    float = 0.0        # unix epoch
+        self._inflight:     asyncio.Task | None = None
+        self._listeners:    list = []
+
+    def on_refresh(self, callback):
+        self._listeners.append(callback)
+
+    @property
+    def fresh(self) -> bool:
+        return bool(self.access_token) and time.time() < self.expires_at - TOKEN_REFRESH_MARGIN
+
+    async def get(self) -> str:
+        if self.fresh:
+            return self.access_token
+        return await self.refresh()
+
+    async def refresh(self, stale: str | None = None) -> str:
+        """Refresh the token, or join a refresh that is already running.
+
+        Pass the token that just failed as *stale*: if another caller has
+        already replaced it, the new token is returned without a second refresh.
+        """
+        if stale is not None and self.access_token != stale and self.fresh:
+            return self.access_token
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._refresh())
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self) -> str:
+        payload = {
+            'client_id':     self._cred.client_id,
+            'client_secret': self._cred.client_secret,
+        }
+        if self.refresh_token:
+            payload.update(grant_type='refresh_token', refresh_token=self.refresh_token)
+        else:
+            payload.update(grant_type='client_credentials')
+        async with self._http.session.post(TWITCH_AUTH_URL, data=payload) as r:
+            if r.status != 200:
+                raise Exception(f"Failed to refresh token for {self._cred.name}: {await r.text()}")
+            js = await r.json()
+
+        # swap every field in one synchronous step so no coroutine can observe
+        # a new access token paired with the old refresh token
+        self.access_token  = js['access_token']
+        self.refresh_token = js.get('refresh_token', self.refresh_token)
+        self.expires_at    = time.time() + js.get('expires_in', 3600)
+        for cb in self._listeners:
+            cb(self.access_token, self.refresh_token)
+        return self.access_token
+
+
+class Credential:
+    """One app registration: its own rate-limit bucket and token cache.
+
+    Helix budgets are per client id, so every extra registration adds a
+    full bucket of throughput.
+    """
+
+    def __init__(self, http: "HelixClient", name: str, client_id: str,
+                 client_secret: str, refresh_token: str | None = None):
+        self.name          = name
+        self.client_id     = client_id
+        self.client_secret = client_secret
+        self.limiter       = HelixRateLimiter()
+        self.tokens        = TokenManager(http, self, refresh_token)
+        self.failed_until  = 0.0               # unix epoch; token refresh failed
+        self.inflight      = 0                 # requests picked but not finished
+
+    @property
+    def headroom(self) -> float:
+        return self.limiter.available - self.inflight
+
+    @property
+    def healthy(self) -> bool:
+        return time.time() >= self.failed_until
+
+    @property
+    def user_token(self) -> bool:
+        """Runs on a user access token (has a refresh token), not an app token."""
+        return bool(self.tokens.refresh_token)
+
+    def fail(self):
+        self.failed_until = time.time() + CREDENTIAL_COOLDOWN
+
+    def __repr__(self):
+        return f"<Credential {self.name}>"
+
+
+def load_credentials() -> list[dict]:
+    """Read every registration named in HELIX_CREDENTIALS from the environment.
+
+    ``HELIX_CREDENTIALS=BILLY,ALT1`` reads CLIENT_ID_BILLY / CLIENT_SECRET_BILLY /
+    REFRESH_TOKEN_BILLY, then the same three for ALT1. The first entry is the
+    bot's own identity (IRC, EventSub) and must have a refresh token; the
+    others may omit it and run on app access tokens, in which case they only
+    serve endpoints that accept one (not channels/followers).
+    """
+    sets = []
+    for name in os.getenv("HELIX_CREDENTIALS", "BILLY").split(","):
+        name = name.strip().upper()
+        if not name:
+            continue
+        client_id     = os.getenv(f"CLIENT_ID_{name}")
+        client_secret = os.getenv(f"CLIENT_SECRET_{name}")
+        if not client_id or not client_secret:
+            print(f"[helix] credential {name} has no CLIENT_ID/CLIENT_SECRET – skipped")
+            continue
+        sets.append({
+            "name":          name,
+            "client_id":     client_id,
+            "client_secret": client_secret,
+            "refresh_token": os.getenv(f"REFRESH_TOKEN_{name}"),
+        })
+    if not sets:
+        raise Exception("No Helix credentials configured (HELIX_CREDENTIALS).")
+    if not sets[0]["refresh_token"]:
+        raise Exception("OAuth refresh token missing. Re-authorize the application.")
+    return sets
+
+
+class HelixClient:
+    """Owns the long-lived aiohttp session used by the bot.
+
+    The session is created lazily on first use so that it is always bound to
+    the running event loop, and is re-created transparently if it was closed.
+
+    Requests are spread over a pool of credentials: calls about one channel
+    stick to the same registration, everything else goes to whichever has the
+    most budget left, and a credential that is rate-limited or cannot get a
+    token is skipped until it recovers. ``primary`` is the bot's own
+    registration and serves anything tied to the bot user.
+    """
+
+    def __init__(self, credentials: list[dict]):
+        self._session: aiohttp.ClientSession | None = None
+        self.credentials = [Credential(self, **c) for c in credentials]
+        self.primary     = self.credentials[0]
+        # per-request timeouts come from the session's ClientTimeout, so time
+        # spent queued in a rate limiter never counts as Helix hanging
+        self.dependency  = Dependency("helix", transient=is_transient)
+
+    @property
+    def tokens(self) -> TokenManager:
+        return self.primary.tokens
+
+    # ─────────────────────────  SESSION LIFECYCLE  ─────────────────────────
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit             = HTTP_POOL_LIMIT,
+                limit_per_host    = HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache     = HTTP_DNS_CACHE_TTL,
+                use_dns_cache     = True,
+                keepalive_timeout = HTTP_KEEPALIVE_TIMEOUT,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total     = HTTP_TIMEOUT_TOTAL,
+                connect   = HTTP_TIMEOUT_CONNECT,
+                sock_read = HTTP_TIMEOUT_SOCK_READ,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def close(self):
+        for cred in self.credentials:
+            cred.limiter.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ─────────────────────────  CREDENTIAL POOL  ───────────────────────────
+    def eligible(self, user_token: bool = False) -> list[Credential]:
+        """Credentials that can serve a request; with *user_token* only the
+        ones holding a user access token (the primary always does)."""
+        return [c for c in self.credentials if c.user_token or not user_token]
+
+    def pick(self, key: str | None = None, exclude=(), user_token: bool = False) -> Credential:
+        """Choose the credential for one request.
+
+        With a *key* (a channel or broadcaster id) the same healthy credential
+        is returned every time, unless its bucket is spoken for; otherwise, or
+        then, the one with the most budget left after its in-flight requests
+        wins. *user_token* limits the choice to credentials with a user
+        access token, for endpoints that reject app tokens.
+        """
+        eligible = self.eligible(user_token)
+        pool = [c for c in eligible if c not in exclude and c.healthy] \
+            or [c for c in eligible if c not in exclude] \
+            or eligible
+        if key is not None:
+            cred = pool[zlib.crc32(str(key).encode()) % len(pool)]
+            if cred.headroom >= 1:
+                return cred
+        return max(pool, key=lambda c: c.headroom)
+
+    @staticmethod
+    def _headers(cred: Credential, token: str) -> dict:
+        return {
+            "Client-ID":     cred.client_id,
+            "Authorization": f"Bearer {token}",
+        }
+
+    # ─────────────────────────  HELIX  ────────────────────────────────────
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        """Send one Helix request, retrying transient failures with jittered
+        back-off; raises CircuitOpenError while Helix is being skipped."""
+        return await self.dependency.call(self._send, method, path, **kwargs)
+
+    async def _send(self, method: str, path: str, *, key: str | None = None,
+                    credential: Credential | None = None, user_token: bool = False,
+                    priority: int = PRIORITY_POLL, params=None, json=None) -> dict:
+        """Send one Helix request through a pooled credential's rate limiter.
+
+        *path* is relative to HELIX_URL unless it is already a full URL.
+        Pass *credential* to pin the request to one registration (anything
+        acting as the bot user); otherwise ``pick(key, user_token=...)``
+        chooses. A 429 is retried once on another credential (or the same one
+        after its reset), a 401 once after refreshing that credential's token.
+        Raises the last token error if no credential could get a token.
+        """
+        url = path if path.startswith("http") else f"{HELIX_URL}/{path}"
+        cred = credential or self.pick(key, user_token=user_token)
+        tried = [cred]
+        error: Exception | None = None
+        for attempt in range(3):
+            current = cred
+            current.inflight += 1
+            try:
+                try:
+                    token = await cred.tokens.get()
+                except Exception as e:
+                    cred.fail()
+                    if credential is not None or len(tried) >= len(self.eligible(user_token)):
+                        raise
+                    error = e
+                    cred = self.pick(key, exclude=tried, user_token=user_token)
+                    tried.append(cred)
+                    continue
+
+                await cred.limiter.acquire(priority)
+                async with self.session.request(method, url,
+                                                headers=self._headers(cred, token),
+                                                params=params, json=json) as r:
+                    cred.limiter.update_from_headers(r.headers)
+                    if attempt < 2:
+                        if r.status == 429:
+                            cred.limiter.on_rate_limited(r.headers)
+                            if credential is None:
+                                cred = self.pick(key, exclude=[cred], user_token=user_token)
+                            continue
+                        if r.status == 401:
+                            await cred.tokens.refresh(stale=token)
+                            continue
+                    r.raise_for_status()
+                    return await r.json()
+            finally:
+                current.inflight -= 1
+        # only reached when every attempt went to fetching a token
+        raise error
+
+    async def _get_chunked(self, path: str, key: str, values: list[str], *,
+                           priority: int, extra: list | None = None) -> list[dict]:
+        """GET *path* for any number of *values*, HELIX_MAX_IDS per request.
+
+        The chunks are sent concurrently, each on whichever credential has the
+        most budget left, and their ``data`` lists are merged in order.
+        """
+        async def _one(chunk):
+            params = [(key, v) for v in chunk] + (extra or [])
+            return (await self._request("GET", path, priority=priority, params=params))["data"]
+
+        pages = await asyncio.gather(*(_one(c) for c in chunked(list(dict.fromkeys(values)))))
+        return [row for page in pages for row in page]
+
+    async def get_streams(self, user_logins: list[str],
+                          priority: int = PRIORITY_STREAMS) -> list[dict]:
+        """Raw helix/streams payloads for the live channels among *user_logins*."""
+        return await self._get_chunked("streams", "user_login", user_logins,
+                                       priority=priority, extra=[("first", str(HELIX_MAX_IDS))])
+
+    async def get_users(self, logins: list[str], priority: int = PRIORITY_START) -> list[dict]:
+        """Raw helix/users payloads for *logins*."""
+        return await self._get_chunked("users", "login", logins, priority=priority)
+
+    async def fetch_follower_count(self, user_id: str, priority: int = PRIORITY_POLL) -> int:
+        # channels/followers rejects app access tokens
+        payload = await self._request("GET", "channels/followers", key=user_id, user_token=True,
+                                      priority=priority, params={"broadcaster_id": user_id})
+        return payload["total"]
+
+    async def fetch_stream_tags(self, broadcaster_id: str, priority: int = PRIORITY_META) -> list[str]:
+        payload = await self._request("GET", "channels", key=broadcaster_id,
+                                      priority=priority, params={"broadcaster_id": broadcaster_id})
+        if not payload["data"]:
+            return []
+        return payload["data"][0].get("tags", [])
+
+    async def create_eventsub_subscription(self, sub_type: str, version: str, condition: dict,
+                                           session_id: str) -> dict:
+        """Subscribe *sub_type* on an EventSub WebSocket session (always as the bot user)."""
+        body = {
+            "type":      sub_type,
+            "version":   version,
+            "condition": condition,
+            "transport": {"method": "websocket", "session_id": session_id},
+        }
+        payload = await self._request("POST", EVENTSUB_API_URL, credential=self.primary,
+                                      priority=PRIORITY_START, json=body)
+        return payload["data"][0]
+
+    # ─────────────────────────  MISC  ─────────────────────────────────────
+    async def ping(self, url: str) -> None:
+        async with self.session.get(url) as resp:
+            await resp.text()
@@ -68,7 +68,7 @@ async def run_bot_forever():
             import constants
 
             channels = constants.MAIN_CHANNELS + getattr(constants, "TEST_USERS", [])
-            bot = StatsBot(channels=channels)
+            bot = await StatsBot.create(channels=channels)
             _bot_holder["stats_bot"] = bot
 
             # Start the bot; this should run until a fatal error or an explicit close.
@@ -83,7 +83,9 @@ async def run_bot_forever():
             traceback.print_exc()
         finally:
             try:
-                # Ensure the client is fully closed before restarting
+                # Ensure the client is fully closed before restarting. This also
+                # runs when SIGTERM cancels us, and close() flushes the buffered
+                # TimeSeries snapshots first.
                 b = _bot_holder.pop("stats_bot", None)
                 if b:
                     await b.close()
@@ -0,0 +1,99 @@
+"""normalized live stream layout: stream_session + live_stream_fact
+
+Used when LIVE_STREAM_LAYOUT=normalized. The existing live_stream rows stay
+where they are; nothing is copied over.
+
+Revision ID: 3785b98121fa
+Revises: 5e9a0b3c7d21
+Create Date: 2026-10-17 04:09:00.100131
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3785b98121fa'
+down_revision = '5e9a0b3c7d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stream_session',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('stream_name', sa.String(length=128), nullable=False),
+    sa.Column('stream_date', sa.Date(), nullable=False),
+    sa.Column('stream_start_time', sa.Time(), nullable=False),
+    sa.Column('day_of_week', sa.String(length=9), nullable=False),
+    sa.Column('is_weekend', sa.Boolean(), nullable=False),
+    sa.Column('is_holiday', sa.Boolean(), nullable=False),
+    sa.Column('days_since_previous_stream', sa.Integer(), nullable=False),
+    sa.Column('followers_start', sa.Integer(), nullable=False),
+    sa.Column('game_category', sa.String(length=128), nullable=False),
+    sa.Column('category_changes', sa.Integer(), nullable=False),
+    sa.Column('title_length', sa.Integer(), nullable=False),
+    sa.Column('has_giveaway', sa.Boolean(), nullable=False),
+    sa.Column('has_qna', sa.Boolean(), nullable=False),
+    sa.Column('tags', sa.JSON(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stream_session', schema=None) as batch_op:
+        batch_op.create_index('uq_stream_session_key', ['stream_name', 'stream_date', 'stream_start_time'], unique=True)
+
+    op.create_table('live_stream_fact',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('snapshot_time', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('stream_duration', sa.Integer(), nullable=False),
+    sa.Column('avg_concurrent_viewers', sa.Float(), nullable=False),
+    sa.Column('peak_concurrent_viewers', sa.Integer(), nullable=False),
+    sa.Column('unique_viewers', sa.Integer(), nullable=False),
+    sa.Column('viewer_growth_rate', sa.Float(), nullable=False),
+    sa.Column('total_num_chats', sa.Integer(), nullable=False),
+    sa.Column('total_chatters', sa.Integer(), nullable=False),
+    sa.Column('chat_msgs_per_minute', sa.Float(), nullable=False),
+    sa.Column('total_emotes_used', sa.Integer(), nullable=False),
+    sa.Column('unique_emotes_used', sa.Integer(), nullable=False),
+    sa.Column('followers_end', sa.Integer(), nullable=False),
+    sa.Column('net_follower_change', sa.Integer(), nullable=False),
+    sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('new_subscriptions_t1', sa.Integer(), nullable=False),
+    sa.Column('new_subscriptions_t2_t3', sa.Integer(), nullable=False),
+    sa.Column('resubscriptions', sa.Integer(), nullable=False),
+    sa.Column('gifted_subs_received', sa.Integer(), nullable=False),
+    sa.Column('gifted_subs_given', sa.Integer(), nullable=False),
+    sa.Column('subscription_cancellations', sa.Integer(), nullable=False),
+    sa.Column('bits_donated', sa.Integer(), nullable=False),
+    sa.Column('donation_events_count', sa.Integer(), nullable=False),
+    sa.Column('total_donation_amount', sa.Float(), nullable=False),
+    sa.Column('raids_received', sa.Integer(), nullable=False),
+    sa.Column('raid_viewers_received', sa.Integer(), nullable=False),
+    sa.Column('polls_run', sa.Integer(), nullable=False),
+    sa.Column('poll_participation', sa.Integer(), nullable=False),
+    sa.Column('predictions_run', sa.Integer(), nullable=False),
+    sa.Column('prediction_participants', sa.Integer(), nullable=False),
+    sa.Column('moderation_actions', sa.Integer(), nullable=False),
+    sa.Column('messages_deleted', sa.Integer(), nullable=False),
+    sa.Column('timeouts_bans', sa.Integer(), nullable=False),
+    sa.Column('avg_sentiment_score', sa.Float(), nullable=True),
+    sa.Column('positive_negative_ratio', sa.Float(), nullable=True),
+    sa.Column('subs_per_avg_viewer', sa.Float(), nullable=False),
+    sa.Column('chat_msgs_per_viewer', sa.Float(), nullable=False),
+    sa.Column('gift_subs_bool', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['session_id'], ['stream_session.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('live_stream_fact', schema=None) as batch_op:
+        batch_op.create_index('ix_live_stream_fact_session_id', ['session_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('live_stream_fact', schema=None) as batch_op:
+        batch_op.drop_index('ix_live_stream_fact_session_id')
+
+    op.drop_table('live_stream_fact')
+    with op.batch_alter_table('stream_session', schema=None) as batch_op:
+        batch_op.drop_index('uq_stream_session_key')
+
+    op.drop_table('stream_session')
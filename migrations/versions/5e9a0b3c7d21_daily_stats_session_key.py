@@ -0,0 +1,53 @@
+"""unique (stream_name, stream_date, stream_start_time) on daily_stats
+
+The end-of-stream rollup upserts on this key. Existing duplicates are
+removed first, keeping the longest row of each session (the newest one on
+a tie), which is what the old read-then-update dedupe kept. The unique
+index replaces the plain one on the same columns.
+
+Revision ID: 5e9a0b3c7d21
+Revises: c2d7e5a1f3b8
+Create Date: 2026-10-17 05:02:37.118530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9a0b3c7d21'
+down_revision = 'c2d7e5a1f3b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        DELETE FROM daily_stats
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY stream_name, stream_date, stream_start_time
+                    ORDER BY stream_duration DESC, id DESC
+                ) AS rn
+                FROM daily_stats
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index('uq_daily_stats_session', 'daily_stats',
+                        ['stream_name', 'stream_date', 'stream_start_time'],
+                        unique=True, postgresql_concurrently=True)
+        op.drop_index('ix_daily_stats_name_date_start', table_name='daily_stats',
+                      postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_daily_stats_name_date_start', 'daily_stats',
+                        ['stream_name', 'stream_date', 'stream_start_time'],
+                        postgresql_concurrently=True)
+        op.drop_index('uq_daily_stats_session', table_name='daily_stats',
+                      postgresql_concurrently=True)
@@ -0,0 +1,55 @@
+"""Twitch stream id on live_stream, daily_stats and stream_session
+
+Sessions are looked up by the stream id Twitch assigns instead of by
+(stream_name, stream_date). The column is nullable: rows written before
+this revision have no id and are still matched the old way. Nothing is
+backfilled.
+
+On Postgres the indexes are built CONCURRENTLY so live_stream stays
+writable while they build.
+
+Revision ID: 6b2f90d4e1c7
+Revises: a4c1e8f27b60
+Create Date: 2026-10-17 05:41:12.502318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2f90d4e1c7'
+down_revision = 'a4c1e8f27b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('daily_stats', sa.Column('stream_id', sa.BigInteger(), nullable=True))
+    op.add_column('live_stream', sa.Column('stream_id', sa.BigInteger(), nullable=True))
+    op.add_column('stream_session', sa.Column('stream_id', sa.BigInteger(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_daily_stats_stream_id', 'daily_stats', ['stream_id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_live_stream_stream_id_id', 'live_stream', ['stream_id', 'id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_stream_session_stream_id', 'stream_session', ['stream_id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_stream_session_stream_id', table_name='stream_session',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_live_stream_stream_id_id', table_name='live_stream',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_daily_stats_stream_id', table_name='daily_stats',
+                      postgresql_concurrently=True)
+
+    with op.batch_alter_table('stream_session', schema=None) as batch_op:
+        batch_op.drop_column('stream_id')
+    with op.batch_alter_table('live_stream', schema=None) as batch_op:
+        batch_op.drop_column('stream_id')
+    with op.batch_alter_table('daily_stats', schema=None) as batch_op:
+        batch_op.drop_column('stream_id')
@@ -0,0 +1,169 @@
+"""baseline
+
+Tables as the app created them before migrations were checked in. Every
+table is only created when missing, so databases that were set up with
+db.create_all() can be stamped forward with a plain `flask db upgrade`.
+
+Revision ID: 94ce869d9151
+Revises:
+Create Date: 2026-10-17 04:00:04.630222
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '94ce869d9151'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'daily_stats' not in existing:
+        op.create_table('daily_stats',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('stream_date', sa.Date(), nullable=False),
+        sa.Column('day_of_week', sa.String(length=9), nullable=False),
+        sa.Column('is_weekend', sa.Boolean(), nullable=False),
+        sa.Column('is_holiday', sa.Boolean(), nullable=False),
+        sa.Column('stream_start_time', sa.Time(), nullable=False),
+        sa.Column('days_since_previous_stream', sa.Integer(), nullable=False),
+        sa.Column('stream_duration', sa.Integer(), nullable=False),
+        sa.Column('avg_concurrent_viewers', sa.Float(), nullable=False),
+        sa.Column('peak_concurrent_viewers', sa.Integer(), nullable=False),
+        sa.Column('unique_viewers', sa.Integer(), nullable=False),
+        sa.Column('viewer_growth_rate', sa.Float(), nullable=False),
+        sa.Column('total_num_chats', sa.Integer(), nullable=False),
+        sa.Column('total_chatters', sa.Integer(), nullable=False),
+        sa.Column('chat_msgs_per_minute', sa.Float(), nullable=False),
+        sa.Column('total_emotes_used', sa.Integer(), nullable=False),
+        sa.Column('unique_emotes_used', sa.Integer(), nullable=False),
+        sa.Column('followers_start', sa.Integer(), nullable=False),
+        sa.Column('followers_end', sa.Integer(), nullable=False),
+        sa.Column('net_follower_change', sa.Integer(), nullable=False),
+        sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+        sa.Column('new_subscriptions_t1', sa.Integer(), nullable=False),
+        sa.Column('new_subscriptions_t2_t3', sa.Integer(), nullable=False),
+        sa.Column('resubscriptions', sa.Integer(), nullable=False),
+        sa.Column('gifted_subs_received', sa.Integer(), nullable=False),
+        sa.Column('gifted_subs_given', sa.Integer(), nullable=False),
+        sa.Column('subscription_cancellations', sa.Integer(), nullable=False),
+        sa.Column('bits_donated', sa.Integer(), nullable=False),
+        sa.Column('donation_events_count', sa.Integer(), nullable=False),
+        sa.Column('total_donation_amount', sa.Float(), nullable=False),
+        sa.Column('raids_received', sa.Integer(), nullable=False),
+        sa.Column('raid_viewers_received', sa.Integer(), nullable=False),
+        sa.Column('polls_run', sa.Integer(), nullable=False),
+        sa.Column('poll_participation', sa.Integer(), nullable=False),
+        sa.Column('predictions_run', sa.Integer(), nullable=False),
+        sa.Column('prediction_participants', sa.Integer(), nullable=False),
+        sa.Column('game_category', sa.String(length=128), nullable=False),
+        sa.Column('category_changes', sa.Integer(), nullable=False),
+        sa.Column('title_length', sa.Integer(), nullable=False),
+        sa.Column('has_giveaway', sa.Boolean(), nullable=False),
+        sa.Column('has_qna', sa.Boolean(), nullable=False),
+        sa.Column('tags', sa.JSON(), nullable=True),
+        sa.Column('moderation_actions', sa.Integer(), nullable=False),
+        sa.Column('messages_deleted', sa.Integer(), nullable=False),
+        sa.Column('timeouts_bans', sa.Integer(), nullable=False),
+        sa.Column('avg_sentiment_score', sa.Float(), nullable=True),
+        sa.Column('min_sentiment_score', sa.Float(), nullable=True),
+        sa.Column('max_sentiment_score', sa.Float(), nullable=True),
+        sa.Column('positive_negative_ratio', sa.Float(), nullable=True),
+        sa.Column('subs_per_avg_viewer', sa.Float(), nullable=False),
+        sa.Column('chat_msgs_per_viewer', sa.Float(), nullable=False),
+        sa.Column('subs_7d_moving_avg', sa.Float(), nullable=True),
+        sa.Column('subs_3d_moving_avg', sa.Float(), nullable=True),
+        sa.Column('viewers_3d_moving_avg', sa.Float(), nullable=True),
+        sa.Column('day_over_day_peak_change', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('gift_subs_bool', sa.Boolean(), nullable=False),
+        sa.Column('stream_name', sa.String(length=128), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'live_stream' not in existing:
+        op.create_table('live_stream',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('stream_name', sa.String(length=128), nullable=False),
+        sa.Column('snapshot_time', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('stream_date', sa.Date(), nullable=True),
+        sa.Column('day_of_week', sa.String(length=9), nullable=False),
+        sa.Column('is_weekend', sa.Boolean(), nullable=False),
+        sa.Column('is_holiday', sa.Boolean(), nullable=False),
+        sa.Column('stream_start_time', sa.Time(), nullable=False),
+        sa.Column('days_since_previous_stream', sa.Integer(), nullable=False),
+        sa.Column('stream_duration', sa.Integer(), nullable=False),
+        sa.Column('avg_concurrent_viewers', sa.Float(), nullable=False),
+        sa.Column('peak_concurrent_viewers', sa.Integer(), nullable=False),
+        sa.Column('unique_viewers', sa.Integer(), nullable=False),
+        sa.Column('viewer_growth_rate', sa.Float(), nullable=False),
+        sa.Column('total_num_chats', sa.Integer(), nullable=False),
+        sa.Column('total_chatters', sa.Integer(), nullable=False),
+        sa.Column('chat_msgs_per_minute', sa.Float(), nullable=False),
+        sa.Column('total_emotes_used', sa.Integer(), nullable=False),
+        sa.Column('unique_emotes_used', sa.Integer(), nullable=False),
+        sa.Column('followers_start', sa.Integer(), nullable=False),
+        sa.Column('followers_end', sa.Integer(), nullable=False),
+        sa.Column('net_follower_change', sa.Integer(), nullable=False),
+        sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+        sa.Column('new_subscriptions_t1', sa.Integer(), nullable=False),
+        sa.Column('new_subscriptions_t2_t3', sa.Integer(), nullable=False),
+        sa.Column('resubscriptions', sa.Integer(), nullable=False),
+        sa.Column('gifted_subs_received', sa.Integer(), nullable=False),
+        sa.Column('gifted_subs_given', sa.Integer(), nullable=False),
+        sa.Column('subscription_cancellations', sa.Integer(), nullable=False),
+        sa.Column('bits_donated', sa.Integer(), nullable=False),
+        sa.Column('donation_events_count', sa.Integer(), nullable=False),
+        sa.Column('total_donation_amount', sa.Float(), nullable=False),
+        sa.Column('raids_received', sa.Integer(), nullable=False),
+        sa.Column('raid_viewers_received', sa.Integer(), nullable=False),
+        sa.Column('polls_run', sa.Integer(), nullable=False),
+        sa.Column('poll_participation', sa.Integer(), nullable=False),
+        sa.Column('predictions_run', sa.Integer(), nullable=False),
+        sa.Column('prediction_participants', sa.Integer(), nullable=False),
+        sa.Column('game_category', sa.String(length=128), nullable=False),
+        sa.Column('category_changes', sa.Integer(), nullable=False),
+        sa.Column('title_length', sa.Integer(), nullable=False),
+        sa.Column('has_giveaway', sa.Boolean(), nullable=False),
+        sa.Column('has_qna', sa.Boolean(), nullable=False),
+        sa.Column('tags', sa.JSON(), nullable=True),
+        sa.Column('moderation_actions', sa.Integer(), nullable=False),
+        sa.Column('messages_deleted', sa.Integer(), nullable=False),
+        sa.Column('timeouts_bans', sa.Integer(), nullable=False),
+        sa.Column('avg_sentiment_score', sa.Float(), nullable=True),
+        sa.Column('positive_negative_ratio', sa.Float(), nullable=True),
+        sa.Column('subs_per_avg_viewer', sa.Float(), nullable=False),
+        sa.Column('chat_msgs_per_viewer', sa.Float(), nullable=False),
+        sa.Column('subs_7d_moving_avg', sa.Float(), nullable=True),
+        sa.Column('subs_3d_moving_avg', sa.Float(), nullable=True),
+        sa.Column('viewers_3d_moving_avg', sa.Float(), nullable=True),
+        sa.Column('day_over_day_peak_change', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('gift_subs_bool', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('live_stream', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_live_stream_snapshot_time'), ['snapshot_time'], unique=False)
+            batch_op.create_index(batch_op.f('ix_live_stream_stream_name'), ['stream_name'], unique=False)
+
+    if 'stream_state' not in existing:
+        op.create_table('stream_state',
+        sa.Column('stream_name', sa.String(length=128), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('stream_name')
+        )
+
+
+def downgrade():
+    op.drop_table('stream_state')
+    with op.batch_alter_table('live_stream', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_live_stream_stream_name'))
+        batch_op.drop_index(batch_op.f('ix_live_stream_snapshot_time'))
+
+    op.drop_table('live_stream')
+    op.drop_table('daily_stats')
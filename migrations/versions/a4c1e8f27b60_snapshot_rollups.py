@@ -0,0 +1,81 @@
+"""5-minute and hourly snapshot rollups: live_stream_5m + live_stream_1h
+
+Filled by retention.Retention from finished sessions before their raw
+live_stream rows are trimmed. Nothing is backfilled here; the first sweep
+rolls up existing sessions in batches.
+
+Revision ID: a4c1e8f27b60
+Revises: 3785b98121fa
+Create Date: 2026-10-17 04:11:38.871276
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c1e8f27b60'
+down_revision = '3785b98121fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('live_stream_1h',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('stream_name', sa.String(length=128), nullable=False),
+    sa.Column('stream_date', sa.Date(), nullable=False),
+    sa.Column('stream_start_time', sa.Time(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('stream_duration', sa.Integer(), nullable=False),
+    sa.Column('avg_concurrent_viewers', sa.Float(), nullable=False),
+    sa.Column('peak_concurrent_viewers', sa.Integer(), nullable=False),
+    sa.Column('chat_msgs_per_minute', sa.Float(), nullable=False),
+    sa.Column('total_num_chats', sa.Integer(), nullable=False),
+    sa.Column('total_chatters', sa.Integer(), nullable=False),
+    sa.Column('followers_end', sa.Integer(), nullable=False),
+    sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('bits_donated', sa.Integer(), nullable=False),
+    sa.Column('avg_sentiment_score', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('live_stream_1h', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_live_stream_1h_bucket_start'), ['bucket_start'], unique=False)
+        batch_op.create_index('uq_live_stream_1h_bucket', ['stream_name', 'stream_date', 'stream_start_time', 'bucket_start'], unique=True)
+
+    op.create_table('live_stream_5m',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('stream_name', sa.String(length=128), nullable=False),
+    sa.Column('stream_date', sa.Date(), nullable=False),
+    sa.Column('stream_start_time', sa.Time(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('stream_duration', sa.Integer(), nullable=False),
+    sa.Column('avg_concurrent_viewers', sa.Float(), nullable=False),
+    sa.Column('peak_concurrent_viewers', sa.Integer(), nullable=False),
+    sa.Column('chat_msgs_per_minute', sa.Float(), nullable=False),
+    sa.Column('total_num_chats', sa.Integer(), nullable=False),
+    sa.Column('total_chatters', sa.Integer(), nullable=False),
+    sa.Column('followers_end', sa.Integer(), nullable=False),
+    sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('bits_donated', sa.Integer(), nullable=False),
+    sa.Column('avg_sentiment_score', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('live_stream_5m', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_live_stream_5m_bucket_start'), ['bucket_start'], unique=False)
+        batch_op.create_index('uq_live_stream_5m_bucket', ['stream_name', 'stream_date', 'stream_start_time', 'bucket_start'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('live_stream_5m', schema=None) as batch_op:
+        batch_op.drop_index('uq_live_stream_5m_bucket')
+        batch_op.drop_index(batch_op.f('ix_live_stream_5m_bucket_start'))
+
+    op.drop_table('live_stream_5m')
+    with op.batch_alter_table('live_stream_1h', schema=None) as batch_op:
+        batch_op.drop_index('uq_live_stream_1h_bucket')
+        batch_op.drop_index(batch_op.f('ix_live_stream_1h_bucket_start'))
+
+    op.drop_table('live_stream_1h')
@@ -0,0 +1,36 @@
+"""broadcaster_meta: cached Helix metadata per broadcaster
+
+The table behind BroadcasterMeta, which broadcaster_cache loads on first
+use and writes back as it looks broadcasters up.
+
+Revision ID: b9d3f61a2c48
+Revises: e07c35b9a8f4
+Create Date: 2026-10-17 09:12:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9d3f61a2c48'
+down_revision = 'e07c35b9a8f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('broadcaster_meta',
+    sa.Column('login', sa.String(length=128), nullable=False),
+    sa.Column('broadcaster_id', sa.String(length=32), nullable=True),
+    sa.Column('display_name', sa.String(length=128), nullable=True),
+    sa.Column('profile_image_url', sa.String(length=512), nullable=True),
+    sa.Column('tags', sa.JSON(), nullable=True),
+    sa.Column('user_fetched_at', sa.DateTime(), nullable=True),
+    sa.Column('tags_fetched_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('login')
+    )
+
+
+def downgrade():
+    op.drop_table('broadcaster_meta')
@@ -0,0 +1,67 @@
+"""composite indexes for the hot live_stream / daily_stats lookups
+
+* live_stream (stream_name, stream_date, id): one session's snapshots in
+  order (rollup, rehydrate on stream start)
+* live_stream (stream_name, id): newest row per channel; replaces the
+  single-column stream_name index, which it covers
+* daily_stats.stream_name_lc: lower(stream_name), stored so the dashboard
+  lookup can use an index instead of scanning on func.lower()
+* daily_stats (stream_name_lc, stream_date, stream_start_time) and
+  (stream_name, stream_date, stream_start_time): latest / previous session
+  per channel and the moving-average ranges
+
+On Postgres the indexes are built CONCURRENTLY so live_stream stays
+writable while they build.
+
+Revision ID: c2d7e5a1f3b8
+Revises: 94ce869d9151
+Create Date: 2026-10-17 04:20:11.318402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d7e5a1f3b8'
+down_revision = '94ce869d9151'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('daily_stats', sa.Column('stream_name_lc', sa.String(length=128), nullable=True))
+    op.execute("UPDATE daily_stats SET stream_name_lc = lower(stream_name)")
+    with op.batch_alter_table('daily_stats', schema=None) as batch_op:
+        batch_op.alter_column('stream_name_lc', existing_type=sa.String(length=128), nullable=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_live_stream_name_date_id', 'live_stream',
+                        ['stream_name', 'stream_date', 'id'], postgresql_concurrently=True)
+        op.create_index('ix_live_stream_name_id', 'live_stream',
+                        ['stream_name', 'id'], postgresql_concurrently=True)
+        op.drop_index('ix_live_stream_stream_name', table_name='live_stream',
+                      postgresql_concurrently=True)
+        op.create_index('ix_daily_stats_name_lc_date_start', 'daily_stats',
+                        ['stream_name_lc', 'stream_date', 'stream_start_time'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_daily_stats_name_date_start', 'daily_stats',
+                        ['stream_name', 'stream_date', 'stream_start_time'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_daily_stats_name_date_start', table_name='daily_stats',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_daily_stats_name_lc_date_start', table_name='daily_stats',
+                      postgresql_concurrently=True)
+        op.create_index('ix_live_stream_stream_name', 'live_stream', ['stream_name'],
+                        postgresql_concurrently=True)
+        op.drop_index('ix_live_stream_name_id', table_name='live_stream',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_live_stream_name_date_id', table_name='live_stream',
+                      postgresql_concurrently=True)
+
+    with op.batch_alter_table('daily_stats', schema=None) as batch_op:
+        batch_op.drop_column('stream_name_lc')
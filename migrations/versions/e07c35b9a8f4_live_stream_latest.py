@@ -0,0 +1,123 @@
+"""live_stream_latest: newest snapshot per channel
+
+Upserted by the snapshot writer with every batch. Backfilled here from the
+newest live_stream row of each channel, or the newest stream_session +
+live_stream_fact row where that is newer (normalized layout).
+
+Revision ID: e07c35b9a8f4
+Revises: 6b2f90d4e1c7
+Create Date: 2026-10-17 04:16:12.868395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e07c35b9a8f4'
+down_revision = '6b2f90d4e1c7'
+branch_labels = None
+depends_on = None
+
+
+# columns kept on stream_session in the normalized layout; the rest come
+# from live_stream_fact, except the moving averages, which it doesn't store
+SESSION_COLUMNS = (
+    'stream_name', 'stream_id', 'stream_date', 'day_of_week', 'is_weekend', 'is_holiday',
+    'stream_start_time', 'days_since_previous_stream', 'followers_start', 'game_category',
+    'category_changes', 'title_length', 'has_giveaway', 'has_qna', 'tags',
+)
+NOT_IN_FACTS = ('subs_7d_moving_avg', 'subs_3d_moving_avg', 'viewers_3d_moving_avg',
+                'day_over_day_peak_change')
+
+
+def upgrade():
+    latest = op.create_table('live_stream_latest',
+    sa.Column('stream_name', sa.String(length=128), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('stream_id', sa.BigInteger(), nullable=True),
+    sa.Column('snapshot_time', sa.DateTime(), nullable=False),
+    sa.Column('stream_date', sa.Date(), nullable=True),
+    sa.Column('day_of_week', sa.String(length=9), nullable=False),
+    sa.Column('is_weekend', sa.Boolean(), nullable=False),
+    sa.Column('is_holiday', sa.Boolean(), nullable=False),
+    sa.Column('stream_start_time', sa.Time(), nullable=False),
+    sa.Column('days_since_previous_stream', sa.Integer(), nullable=False),
+    sa.Column('stream_duration', sa.Integer(), nullable=False),
+    sa.Column('avg_concurrent_viewers', sa.Float(), nullable=False),
+    sa.Column('peak_concurrent_viewers', sa.Integer(), nullable=False),
+    sa.Column('unique_viewers', sa.Integer(), nullable=False),
+    sa.Column('viewer_growth_rate', sa.Float(), nullable=False),
+    sa.Column('total_num_chats', sa.Integer(), nullable=False),
+    sa.Column('total_chatters', sa.Integer(), nullable=False),
+    sa.Column('chat_msgs_per_minute', sa.Float(), nullable=False),
+    sa.Column('total_emotes_used', sa.Integer(), nullable=False),
+    sa.Column('unique_emotes_used', sa.Integer(), nullable=False),
+    sa.Column('followers_start', sa.Integer(), nullable=False),
+    sa.Column('followers_end', sa.Integer(), nullable=False),
+    sa.Column('net_follower_change', sa.Integer(), nullable=False),
+    sa.Column('total_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('new_subscriptions_t1', sa.Integer(), nullable=False),
+    sa.Column('new_subscriptions_t2_t3', sa.Integer(), nullable=False),
+    sa.Column('resubscriptions', sa.Integer(), nullable=False),
+    sa.Column('gifted_subs_received', sa.Integer(), nullable=False),
+    sa.Column('gifted_subs_given', sa.Integer(), nullable=False),
+    sa.Column('subscription_cancellations', sa.Integer(), nullable=False),
+    sa.Column('bits_donated', sa.Integer(), nullable=False),
+    sa.Column('donation_events_count', sa.Integer(), nullable=False),
+    sa.Column('total_donation_amount', sa.Float(), nullable=False),
+    sa.Column('raids_received', sa.Integer(), nullable=False),
+    sa.Column('raid_viewers_received', sa.Integer(), nullable=False),
+    sa.Column('polls_run', sa.Integer(), nullable=False),
+    sa.Column('poll_participation', sa.Integer(), nullable=False),
+    sa.Column('predictions_run', sa.Integer(), nullable=False),
+    sa.Column('prediction_participants', sa.Integer(), nullable=False),
+    sa.Column('game_category', sa.String(length=128), nullable=False),
+    sa.Column('category_changes', sa.Integer(), nullable=False),
+    sa.Column('title_length', sa.Integer(), nullable=False),
+    sa.Column('has_giveaway', sa.Boolean(), nullable=False),
+    sa.Column('has_qna', sa.Boolean(), nullable=False),
+    sa.Column('tags', sa.JSON(), nullable=True),
+    sa.Column('moderation_actions', sa.Integer(), nullable=False),
+    sa.Column('messages_deleted', sa.Integer(), nullable=False),
+    sa.Column('timeouts_bans', sa.Integer(), nullable=False),
+    sa.Column('avg_sentiment_score', sa.Float(), nullable=True),
+    sa.Column('positive_negative_ratio', sa.Float(), nullable=True),
+    sa.Column('subs_per_avg_viewer', sa.Float(), nullable=False),
+    sa.Column('chat_msgs_per_viewer', sa.Float(), nullable=False),
+    sa.Column('subs_7d_moving_avg', sa.Float(), nullable=True),
+    sa.Column('subs_3d_moving_avg', sa.Float(), nullable=True),
+    sa.Column('viewers_3d_moving_avg', sa.Float(), nullable=True),
+    sa.Column('day_over_day_peak_change', sa.Float(), nullable=True),
+    sa.Column('gift_subs_bool', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('stream_name')
+    )
+
+    cols = [c.name for c in latest.columns]
+    op.execute(f"""
+        INSERT INTO live_stream_latest ({', '.join(cols)})
+        SELECT {', '.join(cols)} FROM live_stream
+        WHERE id IN (SELECT max(id) FROM live_stream GROUP BY stream_name)
+    """)
+
+    normalized = [
+        'NULL' if c in NOT_IN_FACTS else f"{'s' if c in SESSION_COLUMNS else 'f'}.{c}"
+        for c in cols
+    ]
+    updates = ', '.join(f"{c} = excluded.{c}" for c in cols if c != 'stream_name')
+    op.execute(f"""
+        INSERT INTO live_stream_latest ({', '.join(cols)})
+        SELECT {', '.join(normalized)}
+        FROM live_stream_fact f JOIN stream_session s ON s.id = f.session_id
+        WHERE f.id IN (
+            SELECT max(f2.id)
+            FROM live_stream_fact f2 JOIN stream_session s2 ON s2.id = f2.session_id
+            GROUP BY s2.stream_name
+        )
+        ON CONFLICT (stream_name) DO UPDATE SET {updates}
+        WHERE excluded.snapshot_time > live_stream_latest.snapshot_time
+    """)
+
+
+def downgrade():
+    op.drop_table('live_stream_latest')
@@ -2,11 +2,35 @@
 
 from db import db
 
+
+# one DailyStats row per stream session
+DAILY_SESSION_KEY = ("stream_name", "stream_date", "stream_start_time")
+
+
+def _lower_stream_name(ctx):
+    return ctx.get_current_parameters()["stream_name"].lower()
+
+
 class DailyStats(db.Model):
     __tablename__ = 'daily_stats'
+    __table_args__ = (
+        # dashboard: latest session for a channel, whatever case it was typed in
+        db.Index("ix_daily_stats_name_lc_date_start",
+                 "stream_name_lc", "stream_date", "stream_start_time"),
+        # one row per session (the rollup upserts on it); also serves the
+        # rollup's previous-session and moving-average lookups
+        db.Index("uq_daily_stats_session", *DAILY_SESSION_KEY, unique=True),
+    )
 
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
 
+    # BigInteger: Twitch stream id of the session (NULL on rows from before it was recorded)
+    stream_id = db.Column(
+        db.BigInteger,
+        nullable=True,
+        index=True
+    )  # e.g. 40952121085
+
     # Date: date of the stream (YYYY-MM-DD)
     stream_date = db.Column(
         db.Date,
@@ -336,6 +360,13 @@ class DailyStats(db.Model):
         nullable=False
     )
 
+    # String: lower(stream_name), the indexed lookup key
+    stream_name_lc = db.Column(
+        db.String(128),
+        nullable=False,
+        default=_lower_stream_name,
+    )  # e.g. "somechannel"
+
     def __repr__(self):
         return f"<DailyStats date={self.stream_date!r}>"
 
@@ -343,9 +374,18 @@ class DailyStats(db.Model):
 
 class TimeSeries(db.Model):
     __tablename__ = 'live_stream'
+    __table_args__ = (
+        # one session's snapshots in order
+        db.Index("ix_live_stream_name_date_id", "stream_name", "stream_date", "id"),
+        # newest snapshot per channel
+        db.Index("ix_live_stream_name_id", "stream_name", "id"),
+        # one session's snapshots by Twitch stream id, newest last
+        db.Index("ix_live_stream_stream_id_id", "stream_id", "id"),
+    )
 
     id             = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    stream_name    = db.Column(db.String(128), nullable=False, index=True)
+    stream_name    = db.Column(db.String(128), nullable=False)
+    stream_id      = db.Column(db.BigInteger, nullable=True)   # Twitch stream id; NULL on old rows
     snapshot_time  = db.Column(db.DateTime, nullable=False, index=True, server_default=db.func.now())
 
     # Date: date of the stream (YYYY-MM-DD)
@@ -675,6 +715,219 @@ class TimeSeries(db.Model):
         return f"<TimeSeries date={self.stream_date!r}>"
 
 
+class StreamSession(db.Model):
+    """Normalized live-stream layout, header side: one row per stream
+    session with the columns that don't change minute to minute (or only
+    occasionally, in which case the row holds the latest value)."""
+
+    __tablename__ = "stream_session"
+    __table_args__ = (
+        db.Index("uq_stream_session_key", *DAILY_SESSION_KEY, unique=True),
+    )
+
+    id                = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    stream_name       = db.Column(db.String(128), nullable=False)
+    stream_date       = db.Column(db.Date, nullable=False)
+    stream_start_time = db.Column(db.Time, nullable=False)
+    stream_id         = db.Column(db.BigInteger, nullable=True, index=True)   # Twitch stream id
+    day_of_week       = db.Column(db.String(9), nullable=False)
+    is_weekend        = db.Column(db.Boolean, nullable=False)
+    is_holiday        = db.Column(db.Boolean, nullable=False)
+    days_since_previous_stream = db.Column(db.Integer, nullable=False)
+    followers_start   = db.Column(db.Integer, nullable=False)
+
+    # latest value; updated in place when it changes
+    game_category     = db.Column(db.String(128), nullable=False)
+    category_changes  = db.Column(db.Integer, nullable=False)
+    title_length      = db.Column(db.Integer, nullable=False)
+    has_giveaway      = db.Column(db.Boolean, nullable=False)
+    has_qna           = db.Column(db.Boolean, nullable=False)
+    tags              = db.Column(db.JSON, nullable=True)
+
+    def __repr__(self):
+        return f"<StreamSession {self.stream_name!r} {self.stream_date!r} {self.stream_start_time!r}>"
+
+
+class StreamFact(db.Model):
+    """Normalized live-stream layout, per-minute side: only the counters,
+    keyed by the session they belong to."""
+
+    __tablename__ = "live_stream_fact"
+    __table_args__ = (
+        db.Index("ix_live_stream_fact_session_id", "session_id", "id"),
+    )
+
+    id                         = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    session_id                 = db.Column(db.Integer, db.ForeignKey("stream_session.id", ondelete="CASCADE"), nullable=False)
+    snapshot_time              = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    stream_duration            = db.Column(db.Integer, nullable=False)
+    avg_concurrent_viewers     = db.Column(db.Float, nullable=False)
+    peak_concurrent_viewers    = db.Column(db.Integer, nullable=False)
+    unique_viewers             = db.Column(db.Integer, nullable=False)
+    viewer_growth_rate         = db.Column(db.Float, nullable=False)
+    total_num_chats            = db.Column(db.Integer, nullable=False)
+    total_chatters             = db.Column(db.Integer, nullable=False)
+    chat_msgs_per_minute       = db.Column(db.Float, nullable=False)
+    total_emotes_used          = db.Column(db.Integer, nullable=False)
+    unique_emotes_used         = db.Column(db.Integer, nullable=False)
+    followers_end              = db.Column(db.Integer, nullable=False)
+    net_follower_change        = db.Column(db.Integer, nullable=False)
+    total_subscriptions        = db.Column(db.Integer, nullable=False)
+    new_subscriptions_t1       = db.Column(db.Integer, nullable=False)
+    new_subscriptions_t2_t3    = db.Column(db.Integer, nullable=False)
+    resubscriptions            = db.Column(db.Integer, nullable=False)
+    gifted_subs_received       = db.Column(db.Integer, nullable=False)
+    gifted_subs_given          = db.Column(db.Integer, nullable=False)
+    subscription_cancellations = db.Column(db.Integer, nullable=False)
+    bits_donated               = db.Column(db.Integer, nullable=False)
+    donation_events_count      = db.Column(db.Integer, nullable=False)
+    total_donation_amount      = db.Column(db.Float, nullable=False)
+    raids_received             = db.Column(db.Integer, nullable=False)
+    raid_viewers_received      = db.Column(db.Integer, nullable=False)
+    polls_run                  = db.Column(db.Integer, nullable=False)
+    poll_participation         = db.Column(db.Integer, nullable=False)
+    predictions_run            = db.Column(db.Integer, nullable=False)
+    prediction_participants    = db.Column(db.Integer, nullable=False)
+    moderation_actions         = db.Column(db.Integer, nullable=False)
+    messages_deleted           = db.Column(db.Integer, nullable=False)
+    timeouts_bans              = db.Column(db.Integer, nullable=False)
+    avg_sentiment_score        = db.Column(db.Float, nullable=True)
+    positive_negative_ratio    = db.Column(db.Float, nullable=True)
+    subs_per_avg_viewer        = db.Column(db.Float, nullable=False)
+    chat_msgs_per_viewer       = db.Column(db.Float, nullable=False)
+    gift_subs_bool             = db.Column(db.Boolean, nullable=False)
+
+    def __repr__(self):
+        return f"<StreamFact session={self.session_id!r} id={self.id!r}>"
+
+
+class SessionSnapshot(db.Model):
+    """Read-only TimeSeries look-alike over stream_session ⋈ live_stream_fact.
+
+    Carries the same attribute names as TimeSeries (``id`` is the fact id),
+    so queries written against TimeSeries run unchanged on the normalized
+    layout.
+    """
+
+    __table__ = db.join(
+        StreamSession.__table__, StreamFact.__table__,
+        StreamSession.__table__.c.id == StreamFact.__table__.c.session_id,
+    )
+
+    id         = StreamFact.__table__.c.id
+    session_id = db.column_property(StreamSession.__table__.c.id, StreamFact.__table__.c.session_id)
+
+    def __repr__(self):
+        return f"<SessionSnapshot date={self.stream_date!r}>"
+
+
+class _SnapshotRollup:
+    """Columns shared by the downsampled live-stream tables: one row per
+    session and time bucket. Gauges are averaged over the bucket, running
+    totals keep their highest value, ``samples`` counts the raw rows."""
+
+    id                      = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    stream_name             = db.Column(db.String(128), nullable=False)
+    stream_date             = db.Column(db.Date, nullable=False)
+    stream_start_time       = db.Column(db.Time, nullable=False)
+    bucket_start            = db.Column(db.DateTime, nullable=False, index=True)   # EST, like snapshot_time
+    samples                 = db.Column(db.Integer, nullable=False)
+
+    stream_duration         = db.Column(db.Integer, nullable=False)     # max
+    avg_concurrent_viewers  = db.Column(db.Float, nullable=False)       # avg
+    peak_concurrent_viewers = db.Column(db.Integer, nullable=False)     # max
+    chat_msgs_per_minute    = db.Column(db.Float, nullable=False)       # avg
+    total_num_chats         = db.Column(db.Integer, nullable=False)     # max
+    total_chatters          = db.Column(db.Integer, nullable=False)     # max
+    followers_end           = db.Column(db.Integer, nullable=False)     # max
+    total_subscriptions     = db.Column(db.Integer, nullable=False)     # max
+    bits_donated            = db.Column(db.Integer, nullable=False)     # max
+    avg_sentiment_score     = db.Column(db.Float, nullable=True)        # avg
+
+
+class SnapshotRollup5m(_SnapshotRollup, db.Model):
+    __tablename__ = "live_stream_5m"
+    __table_args__ = (
+        db.Index("uq_live_stream_5m_bucket", *DAILY_SESSION_KEY, "bucket_start", unique=True),
+    )
+
+
+class SnapshotRollup1h(_SnapshotRollup, db.Model):
+    __tablename__ = "live_stream_1h"
+    __table_args__ = (
+        db.Index("uq_live_stream_1h_bucket", *DAILY_SESSION_KEY, "bucket_start", unique=True),
+    )
+
+
+class LatestSnapshot(db.Model):
+    """Newest snapshot of each channel, one row per channel, upserted with
+    every snapshot batch. Same attribute names as TimeSeries; ``id`` is the
+    id of the live_stream (or live_stream_fact) row it copies."""
+
+    __tablename__ = "live_stream_latest"
+
+    stream_name                = db.Column(db.String(128), primary_key=True)
+    id                         = db.Column(db.Integer, nullable=False)
+    stream_id                  = db.Column(db.BigInteger, nullable=True)
+    snapshot_time              = db.Column(db.DateTime, nullable=False)
+    stream_date                = db.Column(db.Date, nullable=True)
+    day_of_week                = db.Column(db.String(9), nullable=False)
+    is_weekend                 = db.Column(db.Boolean, nullable=False)
+    is_holiday                 = db.Column(db.Boolean, nullable=False)
+    stream_start_time          = db.Column(db.Time, nullable=False)
+    days_since_previous_stream = db.Column(db.Integer, nullable=False)
+    stream_duration            = db.Column(db.Integer, nullable=False)
+    avg_concurrent_viewers     = db.Column(db.Float, nullable=False)
+    peak_concurrent_viewers    = db.Column(db.Integer, nullable=False)
+    unique_viewers             = db.Column(db.Integer, nullable=False)
+    viewer_growth_rate         = db.Column(db.Float, nullable=False)
+    total_num_chats            = db.Column(db.Integer, nullable=False)
+    total_chatters             = db.Column(db.Integer, nullable=False)
+    chat_msgs_per_minute       = db.Column(db.Float, nullable=False)
+    total_emotes_used          = db.Column(db.Integer, nullable=False)
+    unique_emotes_used         = db.Column(db.Integer, nullable=False)
+    followers_start            = db.Column(db.Integer, nullable=False)
+    followers_end              = db.Column(db.Integer, nullable=False)
+    net_follower_change        = db.Column(db.Integer, nullable=False)
+    total_subscriptions        = db.Column(db.Integer, nullable=False)
+    new_subscriptions_t1       = db.Column(db.Integer, nullable=False)
+    new_subscriptions_t2_t3    = db.Column(db.Integer, nullable=False)
+    resubscriptions            = db.Column(db.Integer, nullable=False)
+    gifted_subs_received       = db.Column(db.Integer, nullable=False)
+    gifted_subs_given          = db.Column(db.Integer, nullable=False)
+    subscription_cancellations = db.Column(db.Integer, nullable=False)
+    bits_donated               = db.Column(db.Integer, nullable=False)
+    donation_events_count      = db.Column(db.Integer, nullable=False)
+    total_donation_amount      = db.Column(db.Float, nullable=False)
+    raids_received             = db.Column(db.Integer, nullable=False)
+    raid_viewers_received      = db.Column(db.Integer, nullable=False)
+    polls_run                  = db.Column(db.Integer, nullable=False)
+    poll_participation         = db.Column(db.Integer, nullable=False)
+    predictions_run            = db.Column(db.Integer, nullable=False)
+    prediction_participants    = db.Column(db.Integer, nullable=False)
+    game_category              = db.Column(db.String(128), nullable=False)
+    category_changes           = db.Column(db.Integer, nullable=False)
+    title_length               = db.Column(db.Integer, nullable=False)
+    has_giveaway               = db.Column(db.Boolean, nullable=False)
+    has_qna                    = db.Column(db.Boolean, nullable=False)
+    tags                       = db.Column(db.JSON, nullable=True)
+    moderation_actions         = db.Column(db.Integer, nullable=False)
+    messages_deleted           = db.Column(db.Integer, nullable=False)
+    timeouts_bans              = db.Column(db.Integer, nullable=False)
+    avg_sentiment_score        = db.Column(db.Float, nullable=True)
+    positive_negative_ratio    = db.Column(db.Float, nullable=True)
+    subs_per_avg_viewer        = db.Column(db.Float, nullable=False)
+    chat_msgs_per_viewer       = db.Column(db.Float, nullable=False)
+    subs_7d_moving_avg         = db.Column(db.Float, nullable=True)
+    subs_3d_moving_avg         = db.Column(db.Float, nullable=True)
+    viewers_3d_moving_avg      = db.Column(db.Float, nullable=True)
+    day_over_day_peak_change   = db.Column(db.Float, nullable=True)
+    gift_subs_bool             = db.Column(db.Boolean, nullable=False)
+
+    def __repr__(self):
+        return f"<LatestSnapshot {self.stream_name!r} id={self.id!r}>"
+
+
 class StreamState(db.Model):
     """Persisted per-channel stream state to avoid in-memory loss."""
 
@@ -691,3 +944,24 @@ class StreamState(db.Model):
 
     def __repr__(self):
         return f"<StreamState stream={self.stream_name!r}>"
+
+
+class BroadcasterMeta(db.Model):
+    """Cached Helix metadata per broadcaster, so restarts and stream starts
+    don't need to look it up again. Each field group carries its own fetch
+    timestamp so it can expire on its own TTL."""
+
+    __tablename__ = "broadcaster_meta"
+
+    login             = db.Column(db.String(128), primary_key=True)
+    broadcaster_id    = db.Column(db.String(32), nullable=True)
+    display_name      = db.Column(db.String(128), nullable=True)
+    profile_image_url = db.Column(db.String(512), nullable=True)
+    tags              = db.Column(db.JSON, nullable=True)       # e.g. ["English", "Gaming"]
+
+    # DateTime (UTC): when the users / channels lookups last ran
+    user_fetched_at   = db.Column(db.DateTime, nullable=True)
+    tags_fetched_at   = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<BroadcasterMeta login={self.login!r} id={self.broadcaster_id!r}>"
@@ -0,0 +1,104 @@
+# poll_scheduler.py
+# Deadline-heap scheduler that gives every watched channel its own next-poll
+# time, so offline channels are checked rarely, fresh go-lives often and
+# steady live channels at the normal metrics cadence.
+
+import os, time, heapq, itertools
+
+# ───────────────────────────  CADENCES (seconds)  ────────────────────────────
+LIVE_FAST_INTERVAL     = int(os.getenv("LIVE_FAST_INTERVAL", 15))      # just went live
+LIVE_WARMUP            = int(os.getenv("LIVE_WARMUP", 5 * 60))         # how long "just" lasts
+OFFLINE_POLL_MIN       = int(os.getenv("OFFLINE_POLL_MIN", 60))        # first offline re-check
+OFFLINE_POLL_MAX       = int(os.getenv("OFFLINE_POLL_MAX", 5 * 60))    # back-off ceiling
+PRIORITY_OFFLINE_POLL  = int(os.getenv("PRIORITY_OFFLINE_POLL", 20))   # main channels, offline
+PUSHED_OFFLINE_POLL    = int(os.getenv("PUSHED_OFFLINE_POLL", 10 * 60)) # offline, go-lives pushed by EventSub
+
+
+class ChannelScheduler:
+    """Min-heap of (deadline, channel) with lazy deletion.
+
+    ``pop_due()`` returns every channel whose deadline has passed; the caller
+    polls them and hands each one back through ``reschedule(chan, live)``,
+    which picks the next deadline from the channel's state:
+
+    * offline: doubles from OFFLINE_POLL_MIN up to OFFLINE_POLL_MAX while the
+      channel stays offline (priority channels stay at PRIORITY_OFFLINE_POLL);
+      channels in ``pushed`` get go-lives from EventSub, so they are only
+      reconciled every PUSHED_OFFLINE_POLL
+    * live for less than LIVE_WARMUP: LIVE_FAST_INTERVAL
+    * live: *live_interval* (the bot's metrics cadence)
+    """
+
+    def __init__(self, live_interval: float, priority_channels=()):
+        self.live_interval     = live_interval
+        self.priority_channels = {c.lower() for c in priority_channels}
+        self._heap: list[tuple[float, int, str]] = []
+        self._deadline: dict[str, float] = {}
+        self._offline_streak: dict[str, int] = {}
+        self._live_since: dict[str, float] = {}
+        self._seq = itertools.count()
+        self.pushed: set[str] = set()
+
+    def __contains__(self, chan: str) -> bool:
+        return chan in self._deadline
+
+    def __len__(self) -> int:
+        return len(self._deadline)
+
+    def _push(self, chan: str, deadline: float):
+        self._deadline[chan] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), chan))
+
+    def add(self, chan: str, delay: float = 0.0):
+        """Start tracking *chan*; it becomes due after *delay* seconds."""
+        if chan not in self._deadline:
+            self._push(chan, time.monotonic() + delay)
+
+    def discard(self, chan: str):
+        self._deadline.pop(chan, None)
+        self._offline_streak.pop(chan, None)
+        self._live_since.pop(chan, None)
+
+    def poll_now(self, chan: str):
+        """Make *chan* due immediately (e.g. after an external hint it went live)."""
+        if chan in self._deadline:
+            self._push(chan, time.monotonic())
+
+    def pop_due(self, now: float | None = None, watched=None) -> list[str]:
+        """Channels whose deadline has passed, removed from the heap.
+
+        With *watched*, a due channel outside it (e.g. parted during an IRC
+        reconnect) is discarded instead of returned, so a later ``add()``
+        tracks it again rather than finding it still scheduled.
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, chan = heapq.heappop(self._heap)
+            # stale heap entry (rescheduled or discarded since it was pushed)
+            if self._deadline.get(chan) != deadline:
+                continue
+            if watched is not None and chan not in watched:
+                self.discard(chan)
+                continue
+            due.append(chan)
+        return due
+
+    def next_interval(self, chan: str, live: bool, now: float) -> float:
+        if live:
+            self._offline_streak.pop(chan, None)
+            since = self._live_since.setdefault(chan, now)
+            return LIVE_FAST_INTERVAL if now - since < LIVE_WARMUP else self.live_interval
+
+        self._live_since.pop(chan, None)
+        if chan in self.pushed:
+            return PUSHED_OFFLINE_POLL
+        if chan in self.priority_channels:
+            return PRIORITY_OFFLINE_POLL
+        streak = self._offline_streak.get(chan, 0)
+        self._offline_streak[chan] = streak + 1
+        return min(OFFLINE_POLL_MIN * (2 ** streak), OFFLINE_POLL_MAX)
+
+    def reschedule(self, chan: str, live: bool, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        self._push(chan, now + self.next_interval(chan, live, now))
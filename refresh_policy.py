@@ -0,0 +1,78 @@
+# refresh_policy.py
+# Per-metric refresh cadences for live channels. Each data source (followers,
+# tags, title, …) gets its own interval and remembers the last value it saw,
+# so the polling loop only pays for a Helix call when that metric is due and
+# only touches stats when the value actually changed.
+
+import os
+
+FOLLOWER_REFRESH = int(os.getenv("FOLLOWER_REFRESH", 5 * 60))    # seconds
+TITLE_REFRESH    = int(os.getenv("TITLE_REFRESH", 10 * 60))
+TAGS_REFRESH     = int(os.getenv("TAGS_REFRESH", 30 * 60))
+
+
+class RefreshPolicy:
+    """Cadence and change detection for one metric across all channels."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last_at:    dict[str, float] = {}
+        self._last_value: dict[str, object] = {}
+
+    def due(self, chan: str, now: float) -> bool:
+        last = self._last_at.get(chan)
+        return last is None or now - last >= self.interval
+
+    def done(self, chan: str, now: float, value=None) -> bool:
+        """Mark *chan* refreshed at *now*; return True if *value* changed."""
+        self._last_at[chan] = now
+        changed = self._last_value.get(chan) != value
+        self._last_value[chan] = value
+        return changed
+
+    def forget(self, chan: str):
+        self._last_at.pop(chan, None)
+        self._last_value.pop(chan, None)
+
+
+class FollowerTrend:
+    """Estimate follower counts between real fetches.
+
+    Keeps the last two real samples per channel and extends the line through
+    them, so the per-minute snapshots keep moving between fetches instead of
+    showing a staircase. Every real sample replaces the estimate. The line
+    is only followed upwards from the newest sample, for at most the span
+    between the two samples and at most *max_ahead* seconds, then held.
+    Estimates are for live snapshots only: a finished session is rolled up
+    on a real count (see ``last``).
+    """
+
+    def __init__(self, max_ahead: float = FOLLOWER_REFRESH):
+        self.max_ahead = max_ahead
+        self._samples: dict[str, list[tuple[float, int]]] = {}
+
+    def add(self, chan: str, now: float, count: int):
+        samples = self._samples.setdefault(chan, [])
+        samples.append((now, count))
+        del samples[:-2]
+
+    def estimate(self, chan: str, now: float) -> int | None:
+        samples = self._samples.get(chan)
+        if not samples:
+            return None
+        t1, c1 = samples[-1]
+        if len(samples) < 2:
+            return c1
+        t0, c0 = samples[0]
+        if t1 <= t0 or c1 <= c0:
+            return c1
+        ahead = min(now - t1, t1 - t0, self.max_ahead)
+        return c1 + max(0, int(round((c1 - c0) / (t1 - t0) * ahead)))
+
+    def last(self, chan: str) -> int | None:
+        """The newest real sample, never an estimate."""
+        samples = self._samples.get(chan)
+        return samples[-1][1] if samples else None
+
+    def forget(self, chan: str):
+        self._samples.pop(chan, None)
@@ -0,0 +1,143 @@
+# resilience.py
+# Timeouts, bounded retries with jittered back-off and circuit breakers for
+# StatsBot's external dependencies (Helix, the database, OpenAI), plus the
+# per-tick deadline the polling loop runs under. One hung or failing
+# dependency costs a bounded amount of time per tick and is then skipped for
+# a cool-down instead of stalling every tick behind it.
+
+import os, time, random, asyncio
+
+# ───────────────────────────  RETRIES  ───────────────────────────────────────
+RETRY_ATTEMPTS    = int(os.getenv("RETRY_ATTEMPTS", 3))          # tries per call
+RETRY_BASE_DELAY  = float(os.getenv("RETRY_BASE_DELAY", 0.5))    # seconds
+RETRY_MAX_DELAY   = float(os.getenv("RETRY_MAX_DELAY", 8))
+
+# ───────────────────────────  CIRCUIT BREAKER  ───────────────────────────────
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", 5))       # consecutive failures
+BREAKER_COOLDOWN  = float(os.getenv("BREAKER_COOLDOWN", 60))     # seconds skipped once open
+
+# ───────────────────────────  TIMEOUTS (seconds)  ────────────────────────────
+DB_CALL_TIMEOUT     = float(os.getenv("DB_CALL_TIMEOUT", 10))
+OPENAI_CALL_TIMEOUT = float(os.getenv("OPENAI_CALL_TIMEOUT", 20))
+TICK_DEADLINE       = float(os.getenv("TICK_DEADLINE", 45))      # whole metrics_collector tick
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after BREAKER_THRESHOLD consecutive failures.
+
+    While open, ``allow()`` is False for BREAKER_COOLDOWN seconds. After
+    that calls go through again; the first failure re-opens it straight
+    away and the first success closes it.
+    """
+
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN):
+        self.name       = name
+        self.threshold  = threshold
+        self.cooldown   = cooldown
+        self.failures   = 0
+        self.open_until = 0.0                   # monotonic
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+    def allow(self) -> bool:
+        return not self.is_open
+
+    def success(self):
+        if self.failures >= self.threshold:
+            print(f"[{self.name}] circuit closed")
+        self.failures = 0
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold and not self.is_open:
+            self.open_until = time.monotonic() + self.cooldown
+            print(f"[{self.name}] circuit open for {self.cooldown:.0f}s "
+                  f"after {self.failures} consecutive failures")
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential back-off for retry number *attempt* (0-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class Dependency:
+    """Timeout + bounded retries + circuit breaker around one external service.
+
+    *transient* decides which exceptions are the dependency's fault (network
+    errors, 5xx, lock timeouts…): those are retried with jittered back-off
+    and count against the breaker. Anything else means the service answered
+    and is re-raised immediately. Timeouts are always transient but are only
+    retried when *retry_timeouts* is set, since a timed-out write may still
+    land.
+    """
+
+    def __init__(self, name: str, *, timeout: float | None = None,
+                 attempts: int = RETRY_ATTEMPTS, transient=lambda e: False,
+                 retry_timeouts: bool = True):
+        self.name           = name
+        self.timeout        = timeout
+        self.attempts       = max(1, attempts)
+        self.transient      = transient
+        self.retry_timeouts = retry_timeouts
+        self.breaker        = CircuitBreaker(name)
+
+    async def call(self, fn, *args, **kwargs):
+        """Await ``fn(*args, **kwargs)`` under the timeout, retries and breaker."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+        for attempt in range(self.attempts):
+            try:
+                coro = fn(*args, **kwargs)
+                if self.timeout is not None:
+                    coro = asyncio.wait_for(coro, self.timeout)
+                result = await coro
+            except Exception as e:
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                if not (timed_out or self.transient(e)):
+                    self.breaker.success()          # it answered, just not with what we wanted
+                    raise
+                self.breaker.failure()
+                if (attempt + 1 >= self.attempts or not self.breaker.allow()
+                        or (timed_out and not self.retry_timeouts)):
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"[{self.name}] {type(e).__name__}: {e} – "
+                      f"retry {attempt + 1}/{self.attempts - 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.success()
+                return result
+
+    async def run(self, fn, *args, **kwargs):
+        """``call()`` for a blocking function: it runs in a worker thread so the
+        timeout can fire without the event loop being stuck behind it."""
+        return await self.call(asyncio.to_thread, fn, *args, **kwargs)
+
+
+class Deadline:
+    """Time budget shared by every stage of one polling tick."""
+
+    def __init__(self, seconds: float = TICK_DEADLINE):
+        self.at = time.monotonic() + seconds
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining <= 0
+
+    async def run(self, coro):
+        """Await *coro* within what is left of the budget (TimeoutError if not)."""
+        if self.expired:
+            coro.close()
+            raise asyncio.TimeoutError("tick deadline reached")
+        return await asyncio.wait_for(coro, self.remaining)
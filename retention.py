@@ -0,0 +1,272 @@
+# retention.py
+# Downsampling and retention for the per-minute live-stream snapshots.
+# Finished sessions are rolled up into 5-minute and hourly aggregates
+# (live_stream_5m / live_stream_1h); raw snapshots older than
+# RETENTION_RAW_DAYS and 5-minute buckets older than RETENTION_5M_DAYS are
+# then deleted. Hourly buckets are kept for good. Deletes run in batches of
+# RETENTION_BATCH rows, one short transaction each, so live_stream is never
+# locked for long and the bot's own writes slot in between.
+
+import os, asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func, and_, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.operators import ColumnOperators
+import pytz
+
+from models import (
+    DailyStats, StreamSession, StreamFact, TimeSeries,
+    SnapshotRollup5m, SnapshotRollup1h, DAILY_SESSION_KEY,
+)
+from snapshot_writer import Snapshot, LIVE_STREAM_LAYOUT
+from botdb import dialect_insert
+from resilience import CircuitOpenError
+
+RETENTION_RAW_DAYS  = int(os.getenv("RETENTION_RAW_DAYS", 30))        # per-minute rows
+RETENTION_5M_DAYS   = int(os.getenv("RETENTION_5M_DAYS", 180))        # 5-minute buckets
+RETENTION_BATCH     = int(os.getenv("RETENTION_BATCH", 2000))         # rows per delete
+RETENTION_PAUSE     = float(os.getenv("RETENTION_PAUSE", 0.5))        # seconds between batches
+RETENTION_INTERVAL  = float(os.getenv("RETENTION_INTERVAL", 15 * 60)) # seconds between sweeps
+ROLLUP_SESSIONS     = int(os.getenv("ROLLUP_SESSIONS", 20))           # sessions per sweep
+
+EST = pytz.timezone("US/Eastern")
+
+_TIERS = (
+    (SnapshotRollup5m, timedelta(minutes=5)),
+    (SnapshotRollup1h, timedelta(hours=1)),
+)
+_AVG = ("avg_concurrent_viewers", "chat_msgs_per_minute", "avg_sentiment_score")
+_MAX = ("stream_duration", "peak_concurrent_viewers", "total_num_chats", "total_chatters",
+        "followers_end", "total_subscriptions", "bits_donated")
+
+
+def _bucket(ts: datetime, width: timedelta) -> datetime:
+    midnight = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + (ts - midnight) // width * width
+
+
+def _now_est() -> datetime:
+    # snapshot_time is stored as naive EST
+    return datetime.now(EST).replace(tzinfo=None)
+
+
+def _in_session(stream_name, stream_date, start_time, stream_id):
+    """Filter for one session's raw snapshots: by Twitch stream id where the
+    session has one, otherwise by (name, date, start time).
+
+    Takes either values (one known session) or DailyStats columns (a
+    correlated filter), so the pending check and the rollup itself always
+    look at the same rows.
+    """
+    by_key = and_(
+        Snapshot.stream_name == stream_name,
+        Snapshot.stream_date == stream_date,
+        Snapshot.stream_start_time == start_time,
+    )
+    if stream_id is None:
+        return by_key
+    if not isinstance(stream_id, ColumnOperators):
+        return Snapshot.stream_id == stream_id
+    return or_(Snapshot.stream_id == stream_id, and_(stream_id.is_(None), by_key))
+
+
+class Retention:
+    """Background sweep: roll up finished sessions, then trim old rows.
+
+    A session is rolled up once it has a DailyStats row and still has raw
+    rows; it is rolled up again if raw rows longer than its hourly buckets
+    turn up (bot reconnects), so the aggregates cover the whole session.
+    A session whose rollup fails is skipped from then on so it cannot hold
+    up the ones behind it. Raw rows are only trimmed once no rollups are
+    pending, unless the pending sessions stopped changing between sweeps
+    (then trimming goes ahead rather than waiting on them for good).
+    ``wake()`` starts a sweep early, e.g. right after a stream ended.
+    """
+
+    def __init__(self, botdb, interval: float = RETENTION_INTERVAL):
+        self.botdb    = botdb
+        self.interval = interval
+        self._wake    = asyncio.Event()
+        self._task:   asyncio.Task | None = None
+        self._pending: list[tuple] = []         # last sweep's pending rollups
+        self._failed:  set[tuple]  = set()      # sessions whose rollup raised
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        self._wake.set()
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[retention] sweep failed: {type(e).__name__}: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def sweep(self):
+        now = _now_est()
+        raw_cutoff = now - timedelta(days=RETENTION_RAW_DAYS)
+
+        sessions = await self.botdb.run(self._pending_rollups, self._failed)
+        for key in sessions:
+            try:
+                await self.botdb.run(self._rollup, key)
+            except (OperationalError, asyncio.TimeoutError, CircuitOpenError):
+                raise                           # the database, not the session
+            except Exception as e:
+                print(f"[retention] rollup of {key[:3]} failed, skipping it: {type(e).__name__}: {e}")
+                self._failed.add(key)
+        if sessions:
+            print(f"[retention] rolled up {len(sessions)} session(s)")
+        progress, self._pending = sessions != self._pending, sessions
+        if len(sessions) >= ROLLUP_SESSIONS and progress:
+            # backlog (e.g. the first sweep after deploying): don't delete raw
+            # rows that may not be rolled up yet, carry on with the next batch
+            self._wake.set()
+            return
+
+        deleted = await self._trim(self._delete_raw, raw_cutoff)
+        deleted_5m = await self._trim(self._delete_5m, now - timedelta(days=RETENTION_5M_DAYS))
+        if deleted or deleted_5m:
+            print(f"[retention] deleted {deleted} raw and {deleted_5m} 5-minute row(s)")
+
+    async def _trim(self, fn, cutoff: datetime) -> int:
+        """Run the batch delete *fn* until it comes back short."""
+        total = 0
+        while True:
+            n = await self.botdb.run(fn, cutoff)
+            total += n
+            if n < RETENTION_BATCH:
+                return total
+            await asyncio.sleep(RETENTION_PAUSE)
+
+    # ─────────────────────────  DB SIDE (worker thread)  ───────────────────
+    @staticmethod
+    def _pending_rollups(session, skip=()) -> list[tuple]:
+        """Finished sessions with raw rows whose hourly rollup is missing or
+        ends short of their longest raw row, oldest first, minus *skip*.
+
+        Compared against the raw rows rather than DailyStats.stream_duration,
+        which need not match them (rows from the old date-based rollup carry
+        a later stream's duration under the first stream's start time). The
+        rows are picked by the same filter ``_rollup`` uses, so one rollup
+        always settles a session, also once some of its raw rows are trimmed.
+        """
+        H = SnapshotRollup1h
+        rolled = (
+            select(H.stream_name, H.stream_date, H.stream_start_time,
+                   func.max(H.stream_duration).label("duration"))
+            .group_by(H.stream_name, H.stream_date, H.stream_start_time)
+            .subquery()
+        )
+        in_session = _in_session(DailyStats.stream_name, DailyStats.stream_date,
+                                 DailyStats.stream_start_time, DailyStats.stream_id)
+        raw_duration = (
+            select(func.max(Snapshot.stream_duration))
+            .where(in_session)
+            .scalar_subquery()
+        )
+        rows = session.execute(
+            select(DailyStats.stream_name, DailyStats.stream_date, DailyStats.stream_start_time,
+                   DailyStats.stream_id)
+            .outerjoin(rolled, and_(
+                rolled.c.stream_name == DailyStats.stream_name,
+                rolled.c.stream_date == DailyStats.stream_date,
+                rolled.c.stream_start_time == DailyStats.stream_start_time,
+            ))
+            .where(
+                select(Snapshot.id).where(in_session).exists(),
+                or_(rolled.c.duration.is_(None), rolled.c.duration < raw_duration),
+            )
+            .order_by(DailyStats.stream_date)
+            .limit(ROLLUP_SESSIONS + len(skip))
+        )
+        return [key for key in map(tuple, rows) if key not in skip][:ROLLUP_SESSIONS]
+
+    @staticmethod
+    def _rollup(session, key: tuple):
+        """Aggregate one session's raw snapshots into every tier (upserts,
+        so re-rolling a session just overwrites its buckets)."""
+        rows = session.execute(
+            select(Snapshot.snapshot_time, *(getattr(Snapshot, c) for c in _AVG + _MAX))
+            .where(_in_session(*key))
+            .order_by(Snapshot.id)
+        ).all()
+        if not rows:
+            return
+
+        for model, width in _TIERS:
+            buckets = defaultdict(list)
+            for r in rows:
+                buckets[_bucket(r.snapshot_time, width)].append(r)
+            values = []
+            for start, members in buckets.items():
+                v = dict(zip(DAILY_SESSION_KEY, key[:3]), bucket_start=start, samples=len(members))
+                for col in _AVG:
+                    xs = [getattr(m, col) for m in members if getattr(m, col) is not None]
+                    v[col] = sum(xs) / len(xs) if xs else None
+                for col in _MAX:
+                    v[col] = max(getattr(m, col) for m in members)
+                values.append(v)
+            stmt = dialect_insert(session, model)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[*DAILY_SESSION_KEY, "bucket_start"],
+                set_={c: stmt.excluded[c] for c in ("samples", *_AVG, *_MAX)},
+            )
+            session.execute(stmt, values)
+        session.commit()
+
+    @staticmethod
+    def _delete_raw(session, cutoff: datetime) -> int:
+        if LIVE_STREAM_LAYOUT == "normalized":
+            ids = (
+                select(StreamFact.id)
+                .join(StreamSession, StreamSession.id == StreamFact.session_id)
+                .where(StreamSession.stream_date < cutoff.date())
+                .limit(RETENTION_BATCH)
+            )
+            n = session.execute(delete(StreamFact).where(StreamFact.id.in_(ids))).rowcount
+            if n < RETENTION_BATCH:
+                # headers whose facts are all gone
+                empty = (
+                    select(StreamSession.id)
+                    .where(StreamSession.stream_date < cutoff.date(),
+                           ~select(StreamFact.id).where(StreamFact.session_id == StreamSession.id).exists())
+                    .limit(RETENTION_BATCH)
+                )
+                session.execute(delete(StreamSession).where(StreamSession.id.in_(empty)))
+        else:
+            ids = select(TimeSeries.id).where(TimeSeries.snapshot_time < cutoff).limit(RETENTION_BATCH)
+            n = session.execute(delete(TimeSeries).where(TimeSeries.id.in_(ids))).rowcount
+        session.commit()
+        return n
+
+    @staticmethod
+    def _delete_5m(session, cutoff: datetime) -> int:
+        ids = (
+            select(SnapshotRollup5m.id)
+            .where(SnapshotRollup5m.bucket_start < cutoff)
+            .limit(RETENTION_BATCH)
+        )
+        n = session.execute(delete(SnapshotRollup5m).where(SnapshotRollup5m.id.in_(ids))).rowcount
+        session.commit()
+        return n
@@ -0,0 +1,271 @@
+# snapshot_writer.py
+# Write-behind buffer for the per-minute TimeSeries snapshots. Channels hand
+# their snapshot to the buffer and carry on; the buffer flushes every row
+# collected since the last flush as one bulk INSERT in one transaction,
+# instead of one commit (and one fsync) per channel per tick. Snapshots that
+# repeat the channel's previous one are held back instead of written, up to
+# a heartbeat interval.
+#
+# Two storage layouts, picked with LIVE_STREAM_LAYOUT:
+#   wide        one live_stream (TimeSeries) row per snapshot, every column
+#   normalized  one stream_session header per session + a narrow
+#               live_stream_fact row per snapshot; readers query it through
+#               SessionSnapshot, which has the same attributes as TimeSeries
+# ``Snapshot`` is the model readers should query for the active layout.
+# Either way each batch also upserts every channel's newest row into
+# live_stream_latest (LatestSnapshot), so "current state of channel X" is
+# a primary-key lookup.
+
+import os, time, asyncio
+from datetime import date
+from sqlalchemy import insert
+
+from models import (
+    TimeSeries, StreamSession, StreamFact, SessionSnapshot, LatestSnapshot, DAILY_SESSION_KEY,
+)
+from botdb import dialect_insert
+
+SNAPSHOT_FLUSH_SIZE     = int(os.getenv("SNAPSHOT_FLUSH_SIZE", 500))       # rows
+SNAPSHOT_FLUSH_INTERVAL = float(os.getenv("SNAPSHOT_FLUSH_INTERVAL", 5))   # seconds
+SNAPSHOT_BUFFER_MAX     = int(os.getenv("SNAPSHOT_BUFFER_MAX", 10_000))    # kept while the DB is down
+SNAPSHOT_HEARTBEAT      = float(os.getenv("SNAPSHOT_HEARTBEAT", 15 * 60))  # seconds between unchanged rows
+LIVE_STREAM_LAYOUT      = os.getenv("LIVE_STREAM_LAYOUT", "wide").lower()  # "wide" or "normalized"
+
+Snapshot = SessionSnapshot if LIVE_STREAM_LAYOUT == "normalized" else TimeSeries
+
+_LATEST_COLUMNS  = [c.name for c in LatestSnapshot.__table__.columns
+                    if not c.primary_key and c.name != "id"]
+_SESSION_COLUMNS = [c.name for c in StreamSession.__table__.columns if not c.primary_key]
+_FACT_COLUMNS    = [c.name for c in StreamFact.__table__.columns
+                    if not c.primary_key and c.name != "session_id"]
+# header columns that may change during a session; the rest are fixed by its first row
+_SESSION_LATEST  = ("game_category", "category_changes", "title_length", "has_giveaway", "has_qna", "tags")
+
+# columns that move every tick on their own; a snapshot that differs from
+# the previous one only in these counts as unchanged
+_VOLATILE = frozenset({
+    "snapshot_time", "stream_duration", "chat_msgs_per_minute", "days_since_previous_stream",
+})
+
+
+def _unchanged(prev: dict, fields: dict) -> bool:
+    return all(v == prev.get(k) for k, v in fields.items() if k not in _VOLATILE)
+
+
+class SnapshotWriter:
+    """Buffers TimeSeries rows (as column dicts) and writes them in batches.
+
+    A flush happens when SNAPSHOT_FLUSH_SIZE rows are waiting or the oldest
+    one has waited SNAPSHOT_FLUSH_INTERVAL seconds, whichever comes first;
+    ``flush()`` forces one (e.g. before the end-of-stream rollup reads the
+    rows back) and ``close()`` does a final one on shutdown.
+
+    Writes go through *botdb* (botdb.BotDB), so they run off the event loop
+    with the db timeout, retries and circuit breaker. A batch that
+    fails is put back and retried on the next flush, up to
+    SNAPSHOT_BUFFER_MAX rows; one that timed out is dropped, since it may
+    still have been committed.
+
+    A snapshot equal to the channel's previous one (ignoring the _VOLATILE
+    columns) is not written unless SNAPSHOT_HEARTBEAT seconds have passed
+    since the last row that was; the newest such row is held and written by
+    ``end()`` when the session ends, or by ``close()``, so the last row of
+    a session always carries its final duration. Readers therefore see
+    gaps of up to a heartbeat in which nothing but the duration moved.
+
+    ``last`` indexes each channel's newest stored row as (stream_date, id).
+    The bot seeds it with ``remember()`` when a session starts and every
+    committed batch advances it, so days_since_previous_stream is computed
+    without querying live_stream; only channels missing from the index are
+    looked up, in live_stream_latest.
+    """
+
+    def __init__(self, botdb, flush_size: int = SNAPSHOT_FLUSH_SIZE,
+                 flush_interval: float = SNAPSHOT_FLUSH_INTERVAL,
+                 heartbeat: float = SNAPSHOT_HEARTBEAT):
+        self.botdb          = botdb
+        self.flush_size     = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.heartbeat      = heartbeat
+        self._rows:         list[dict] = []
+        self._first_at:     float | None = None       # monotonic, oldest buffered row
+        self._lock          = asyncio.Lock()
+        self._wake          = asyncio.Event()
+        self._task:         asyncio.Task | None = None
+        self.last:          dict[str, tuple[date, int] | None] = {}   # None: no rows yet
+        self._prev:         dict[str, tuple[float, dict]] = {}        # chan → (monotonic, last row queued)
+        self._held:         dict[str, dict] = {}                      # chan → newest unchanged row not queued
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def remember(self, chan: str, row=None):
+        """Seed the index from a row read at session start (None: the channel has none)."""
+        self.last[chan] = (row.stream_date, row.id) if row is not None else None
+
+    def add(self, fields: dict) -> bool:
+        """Queue one snapshot unless it repeats the previous one (see above);
+        never blocks and never touches the DB. True if it was queued."""
+        chan = fields["stream_name"]
+        now  = time.monotonic()
+        prev = self._prev.get(chan)
+        if prev is not None and now - prev[0] < self.heartbeat and _unchanged(prev[1], fields):
+            self._held[chan] = fields
+            return False
+        self._held.pop(chan, None)
+        self._prev[chan] = (now, fields)
+        self._append(fields)
+        return True
+
+    def end(self, chan: str) -> dict | None:
+        """The channel's session is over: queue its held row, if any, and
+        start the next session from a clean slate. Returns the row queued."""
+        self._prev.pop(chan, None)
+        held = self._held.pop(chan, None)
+        if held is not None:
+            self._append(held)
+        return held
+
+    def _append(self, fields: dict):
+        if not self._rows:
+            self._first_at = time.monotonic()
+        self._rows.append(fields)
+        if len(self._rows) >= self.flush_size:
+            self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        async with self._lock:
+            if not self._rows:
+                return
+            batch, self._rows, self._first_at = self._rows, [], None
+            known = {
+                r["stream_name"]: self.last[r["stream_name"]]
+                for r in batch if r["stream_name"] in self.last
+            }
+            try:
+                written = await self.botdb.run(self._write, batch, known)
+            except asyncio.TimeoutError:
+                print(f"[snapshots] flush of {len(batch)} row(s) timed out; not retried")
+            except Exception as e:
+                print(f"[snapshots] flush of {len(batch)} row(s) failed: {type(e).__name__}: {e}")
+                self._rows = batch + self._rows
+                overflow = len(self._rows) - SNAPSHOT_BUFFER_MAX
+                if overflow > 0:
+                    print(f"[snapshots] buffer full; dropping {overflow} oldest row(s)")
+                    del self._rows[:overflow]
+                self._first_at = time.monotonic()
+            else:
+                for chan, stream_date, row_id in written:
+                    self.last[chan] = (stream_date, row_id)
+
+    async def close(self):
+        """Stop the background loop and write whatever is still buffered or held."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        for chan in list(self._held):
+            self._rows.append(self._held.pop(chan))
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"[snapshots] final flush failed: {type(e).__name__}: {e}")
+        if self._rows:
+            print(f"[snapshots] {len(self._rows)} row(s) lost on shutdown")
+
+    async def _run(self):
+        while self._rows:
+            wait = self.flush_interval - (time.monotonic() - (self._first_at or time.monotonic()))
+            if wait > 0 and len(self._rows) < self.flush_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            await self.flush()
+            if self._rows:                      # flush failed – back off one interval
+                await asyncio.sleep(self.flush_interval)
+
+    # ─────────────────────────  DB SIDE (worker thread)  ───────────────────
+    @staticmethod
+    def _write(session, batch: list[dict], known: dict) -> list[tuple[str, date, int]]:
+        """Insert *batch*; return each channel's newest (stream_name, stream_date, id)."""
+        # days_since_previous_stream is relative to each channel's newest
+        # stored row, then to the previous row in this batch
+        last_date = {c: v[0] for c, v in known.items() if v is not None}
+        unknown = {r["stream_name"] for r in batch} - known.keys()
+        if unknown:
+            last_date.update(
+                session.query(LatestSnapshot.stream_name, LatestSnapshot.stream_date)
+                .filter(LatestSnapshot.stream_name.in_(unknown))
+                .all()
+            )
+        for r in batch:
+            prev = last_date.get(r["stream_name"])
+            r["days_since_previous_stream"] = (r["stream_date"] - prev).days if prev else 0
+            last_date[r["stream_name"]] = r["stream_date"]
+
+        if LIVE_STREAM_LAYOUT == "normalized":
+            inserted = SnapshotWriter._insert_normalized(session, batch)
+        else:
+            inserted = session.execute(
+                insert(TimeSeries).returning(TimeSeries.id, TimeSeries.stream_name), batch
+            )
+        newest: dict[str, int] = {}
+        for row_id, chan in inserted:
+            newest[chan] = max(row_id, newest.get(chan, row_id))
+        SnapshotWriter._upsert_latest(session, batch, newest)
+        session.commit()
+        return [(chan, last_date[chan], row_id) for chan, row_id in newest.items()]
+
+    @staticmethod
+    def _upsert_latest(session, batch: list[dict], newest: dict[str, int]):
+        """Replace each channel's live_stream_latest row with its newest row in *batch*."""
+        rows = {r["stream_name"]: r for r in batch}
+        stmt = dialect_insert(session, LatestSnapshot).values([
+            {**{k: r[k] for k in _LATEST_COLUMNS}, "stream_name": chan, "id": newest[chan]}
+            for chan, r in rows.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["stream_name"],
+            set_={k: stmt.excluded[k] for k in ("id", *_LATEST_COLUMNS)},
+        )
+        session.execute(stmt)
+
+    @staticmethod
+    def _insert_normalized(session, batch: list[dict]) -> list[tuple[int, str]]:
+        """Upsert the batch's session headers, insert its facts; (fact id, stream_name) pairs."""
+        # one header per session; the newest row in the batch has the latest values
+        headers = {tuple(r[k] for k in DAILY_SESSION_KEY): r for r in batch}
+        first   = {}
+        for r in batch:
+            first.setdefault(tuple(r[k] for k in DAILY_SESSION_KEY), r)
+        stmt = dialect_insert(session, StreamSession).values([
+            {**{k: r[k] for k in _SESSION_COLUMNS},
+             "days_since_previous_stream": first[key]["days_since_previous_stream"],
+             "followers_start":            first[key]["followers_start"]}
+            for key, r in headers.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=DAILY_SESSION_KEY,
+            set_={k: stmt.excluded[k] for k in _SESSION_LATEST},
+        ).returning(StreamSession.id, *(getattr(StreamSession, k) for k in DAILY_SESSION_KEY))
+        session_ids = {tuple(key): sid for sid, *key in session.execute(stmt)}
+
+        facts = [
+            {**{k: r[k] for k in _FACT_COLUMNS},
+             "session_id": session_ids[tuple(r[k] for k in DAILY_SESSION_KEY)]}
+            for r in batch
+        ]
+        chans = {sid: key[0] for key, sid in session_ids.items()}
+        return [
+            (row_id, chans[sid])
+            for row_id, sid in session.execute(
+                insert(StreamFact).returning(StreamFact.id, StreamFact.session_id), facts
+            )
+        ]
@@ -5,79 +5,45 @@
 import os, time, re, asyncio, aiohttp, pytz, holidays
 from datetime import datetime, timedelta, date
 from twitchio.ext import commands, routines
-from sqlalchemy import func
+from twitchio.models import Stream
+from sqlalchemy import func, select, delete, case, and_
+from sqlalchemy.exc import OperationalError
 from openai import OpenAI
-from openai import BadRequestError
-
-from db import db
-from models import DailyStats, TimeSeries
-from utils import get_oauth_token
+from openai import BadRequestError, APIConnectionError, RateLimitError, InternalServerError
+
+from models import DailyStats, StreamState, LatestSnapshot, DAILY_SESSION_KEY
+from helix import HelixClient, load_credentials, PRIORITY_START
+from broadcaster_cache import BroadcasterCache
+from poll_scheduler import ChannelScheduler
+from eventsub import EventSubClient, EVENTSUB_ENABLED
+from refresh_policy import (
+    RefreshPolicy, FollowerTrend, FOLLOWER_REFRESH, TITLE_REFRESH, TAGS_REFRESH,
+)
+from resilience import Dependency, Deadline, CircuitOpenError, OPENAI_CALL_TIMEOUT
+from botdb import BotDB, dialect_insert
+from snapshot_writer import SnapshotWriter, Snapshot
+from stream_drafts import StreamDrafts
+from retention import Retention
 import utils
 from constants import MAIN_CHANNELS
 
 # ─────────────────────────────  ENV / TOKENS  ────────────────────────────────
-CLIENT_ID       = os.getenv("CLIENT_ID_BILLY")
-CLIENT_SECRET   = os.getenv("CLIENT_SECRET_BILLY")
-REFRESH_TOKEN   = os.getenv("REFRESH_TOKEN_BILLY")
-OAUTH_TOKEN, REFRESH_TOKEN = get_oauth_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
+# Credentials come from HELIX_CREDENTIALS (see helix.load_credentials); the
+# first set (BILLY by default) is the bot's own IRC / EventSub identity.
 
 EST             = pytz.timezone("US/Eastern")
 US_HOLIDAYS     = holidays.US()
 METRICS_INC = 60
+SCHEDULER_TICK = int(os.getenv("SCHEDULER_TICK", 5))        # how often due channels are checked
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", 10))   # live channels polled at once
 
-# ───────────────────────  TWITCH APP-TOKEN HELPER  ───────────────────────────
-_app_token:   str | None = None
-_token_expiry:          float = 0.0       # unix epoch
 est = pytz.timezone('America/New_York')
 
-async def get_app_access_token() -> str:
-    """Return (and cache) an app access-token for helix calls."""
-    global _app_token, _token_expiry
-    if _app_token and time.time() < (_token_expiry - 60):
-        return _app_token
-
-    data = {
-        "client_id":     CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "grant_type":    "client_credentials",
-    }
-    async with aiohttp.ClientSession() as sess:
-        async with sess.post("https://id.twitch.tv/oauth2/token", data=data) as r:
-            r.raise_for_status()
-            js = await r.json()
-
-    _app_token    = js["access_token"]
-    _token_expiry = time.time() + js["expires_in"]
-    return _app_token
-
-
-async def fetch_follower_count(user_id: str, user_token: str) -> int:
-    url = "https://api.twitch.tv/helix/channels/followers"
-    headers = {
-        "Client-ID":     CLIENT_ID,
-        "Authorization": f"Bearer {user_token}",
-    }
-    async with aiohttp.ClientSession() as sess:
-        async with sess.get(url, headers=headers,
-                            params={"broadcaster_id": user_id}) as r:
-            r.raise_for_status()
-            return (await r.json())["total"]
-
-
-async def fetch_stream_tags(broadcaster_id: str, token: str) -> list[str]:
-    url = "https://api.twitch.tv/helix/channels"
-    headers = {
-        "Client-ID":     CLIENT_ID,
-        "Authorization": f"Bearer {token}",
-    }
-    async with aiohttp.ClientSession() as sess:
-        async with sess.get(url, headers=headers,
-                            params={"broadcaster_id": broadcaster_id}) as r:
-            r.raise_for_status()
-            payload = await r.json()
-    if not payload["data"]:
-        return []
-    return payload["data"][0].get("tags", [])
+
+def _stream_id(live: Stream) -> int:
+    """Twitch stream id of *live* as stored in the stream_id columns
+    (TwitchIO hands over the raw Helix string)."""
+    return int(live.id)
 
 
 # ─────────────────────────────  MAIN BOT  ────────────────────────────────────
@@ -86,19 +52,20 @@ class StatsBot(commands.Bot):
 
     SENTIMENT_INTERVAL = timedelta(minutes=5)
 
-    def __init__(self, channels: list[str]):
+    def __init__(self, channels: list[str], helix: HelixClient):
         first, *rest = [c.lower() for c in channels]
         super().__init__(
-            token=OAUTH_TOKEN,
-            client_id=CLIENT_ID,
-            client_secret=CLIENT_SECRET,
-            refresh_token=REFRESH_TOKEN,
+            token=helix.tokens.access_token,
+            client_id=helix.primary.client_id,
+            client_secret=helix.primary.client_secret,
+            refresh_token=helix.tokens.refresh_token,
             prefix="!",
             initial_channels=[first],
             initial_membership = True,
             join_timeout       = 10,
         )
         self._queued_channels = rest
+        self._watched_channels = [first, *rest]
         # runtime state
         self.live_channels:          set[str] = set()
         self.stats_by_channel:       dict[str, dict] = {}
@@ -106,11 +73,57 @@ class StatsBot(commands.Bot):
         self.processed_events:       set[str] = set()
         self.bulk_gift_ids:          set[str] = set()
         self.conversation_history_metadata: list[dict] = []   # external code can append
-        self.client = OpenAI(api_key=os.getenv('OPENAI_KEY'))
+        # retries are done by self.deps['openai'], not by the client as well
+        self.client = OpenAI(api_key=os.getenv('OPENAI_KEY'), max_retries=0)
         self.google_service = utils.authenticate_gdrive()
         self.load_chat_history()
         self.last_ping_time = 0
         self._reconnect_delay = 1
+        # one pooled HTTP client for every Helix / OAuth / keep-alive call,
+        # spreading Helix requests over every configured credential
+        self.helix = helix
+        self.helix.tokens.on_refresh(self._apply_tokens)
+        # every query / commit on the bot path runs on botdb's own threads and
+        # connection pool (with its own timeout / retries / circuit breaker)
+        from main import app
+        self.botdb = BotDB(app.config["SQLALCHEMY_DATABASE_URI"])
+        # login → id / profile / tags, persisted across restarts
+        self.meta = BroadcasterCache(self.helix, self.botdb)
+        # per-channel next-poll deadlines
+        self.poll_schedule = ChannelScheduler(METRICS_INC, priority_channels=MAIN_CHANNELS)
+        self._last_polled_at:       dict[str, float] = {}
+        self._last_history_save:    float = 0.0
+        # per-metric cadences: viewers every poll, the rest on slower cycles
+        self.refresh = {
+            'followers': RefreshPolicy(FOLLOWER_REFRESH),
+            'title':     RefreshPolicy(TITLE_REFRESH),
+            'tags':      RefreshPolicy(TAGS_REFRESH),
+        }
+        self.follower_trend = FollowerTrend()
+        # pushed online / offline / follow events; polling reconciles behind it
+        self.eventsub = EventSubClient(self.helix, {
+            'stream.online':  self._eventsub_online,
+            'stream.offline': self._eventsub_offline,
+            'channel.follow': self._eventsub_follow,
+        })
+        self._starting:             set[str] = set()
+        self._ending:               set[str] = set()
+        # timeouts / retries / circuit breakers for the other dependencies;
+        # Helix has its own in self.helix
+        self.deps = {
+            'openai': Dependency(
+                'openai', timeout=OPENAI_CALL_TIMEOUT,
+                transient=lambda e: isinstance(
+                    e, (APIConnectionError, RateLimitError, InternalServerError)
+                ),
+            ),
+        }
+        # per-minute snapshots are buffered and bulk-inserted in batches
+        self.snapshots = SnapshotWriter(self.botdb)
+        # ...and folded into a running DailyStats draft per session
+        self.drafts = StreamDrafts(self.botdb)
+        # finished sessions rolled up into 5-min / hourly tables, old rows trimmed
+        self.retention = Retention(self.botdb)
 
         # start the polling loop
         # self.metrics_collector.start()
@@ -130,13 +143,37 @@ class StatsBot(commands.Bot):
     #             delay = min(delay * 2, 300)
     #             self._reconnect_delay = delay
 
-    def _rehydrate_stats(self, row: TimeSeries) -> dict:
-        """Reconstruct in-memory stats dict from a TimeSeries row."""
+    @classmethod
+    async def create(cls, channels: list[str]) -> "StatsBot":
+        """Fetch the initial user token without blocking the loop, then build the bot."""
+        helix = HelixClient(load_credentials())
+        try:
+            await helix.tokens.get()
+            return cls(channels=channels, helix=helix)
+        except BaseException:
+            await helix.close()
+            raise
+
+    def _apply_tokens(self, access_token: str, refresh_token: str):
+        """Push a refreshed token pair into TwitchIO's HTTP and IRC clients in one step."""
+        if refresh_token != self._http._refresh_token:
+            utils.update_refresh_token(refresh_token)
+        self._http.token          = access_token
+        self._http._refresh_token = refresh_token
+        self._connection._token   = access_token
+
+    async def event_token_expired(self):
+        # TwitchIO hit an invalid token – hand it ours instead of its own refresh
+        return await self.helix.tokens.refresh(stale=self._http.token)
+
+    def _rehydrate_stats(self, row: LatestSnapshot) -> dict:
+        """Reconstruct in-memory stats dict from a snapshot row."""
         start_dt = datetime.combine(row.stream_date, row.stream_start_time)
         if start_dt.tzinfo is None:
             start_dt = EST.localize(start_dt)
         stats = {
             'stream_name':            row.stream_name,
+            'stream_id':              row.stream_id,
             'stream_date':            row.stream_date,
             'start_time':             start_dt,
             'viewer_counts':          [row.avg_concurrent_viewers],
@@ -180,12 +217,27 @@ class StatsBot(commands.Bot):
 
     async def event_ready(self):
         print(f"Logged in as | {self.nick}")
+        # sessions that were live when the bot went down carry on right away,
+        # not one by one as the joins and polling ticks reach them
+        await self._resume_live_sessions(self._watched_channels)
         # join the remaining channels in small bursts
         for i in range(0, len(self._queued_channels), 4):
             await self.join_channels(self._queued_channels[i : i + 4])
             await asyncio.sleep(4)
         print(f"Connected to: {[ch.name for ch in self.connected_channels if ch]}")
 
+        if EVENTSUB_ENABLED:
+            try:
+                chans = [ch.name.lower() for ch in self.connected_channels if ch]
+                metas = await self.meta.resolve(chans)
+                self.eventsub.watch(
+                    {c: m['broadcaster_id'] for c, m in metas.items()},
+                    moderator_id=self.user_id,
+                )
+                self.eventsub.start()
+            except Exception as e:
+                print(f"[eventsub] not started: {type(e).__name__}: {e}")
+
         # 🔺  NOW start the polling loop (all joins finished)
         try:
             self.metrics_collector.start()
@@ -196,6 +248,7 @@ class StatsBot(commands.Bot):
             self._watchdog.start()
         except RuntimeError:
             pass
+        self.retention.start()
 
     async def save_chat_history(self):
         await utils.save_data(
@@ -251,448 +304,550 @@ class StatsBot(commands.Bot):
 
 
     # ─────────────────────────  POLLING LOOP  ───────────────────────────────
-    @routines.routine(seconds=METRICS_INC)
+    # The routine wakes every SCHEDULER_TICK seconds but only queries the
+    # channels whose own deadline in self.poll_schedule has passed; live
+    # metrics are still sampled once per METRICS_INC. Each tick runs under a
+    # TICK_DEADLINE budget: stages that finish in time are kept, the rest are
+    # cut off and picked up again on a later tick.
+    @routines.routine(seconds=SCHEDULER_TICK)
     async def metrics_collector(self):
         await self.wait_for_ready()
+        due = []
+        now_live = set()
+        pending_end = set()
+        deadline = Deadline()
         try:
-            await self.save_chat_history()
+            if time.monotonic() - self._last_history_save >= METRICS_INC:
+                self._last_history_save = time.monotonic()
+                await self.save_chat_history()
 
-            channels = [ch.name for ch in self.connected_channels if ch]
+            channels = {ch.name.lower() for ch in self.connected_channels if ch}
             if not channels:          # nothing joined yet → just wait for next tick
                 return
-            streams  = await self.fetch_streams(user_logins=channels)   # live only
-            now_live = {s.user.name.lower() for s in streams}
-
-            # newly-started streams
-            for s in streams:
-                name = s.user.name.lower()
-                if name not in self.live_channels:
-                    try:
-                        await self._on_stream_start(s)
-                    except Exception:
-                        import traceback; traceback.print_exc()
-
-            # per-stream polling metrics
-            await self._collect_polling_metrics(streams)
+            for chan in channels:
+                self.poll_schedule.add(chan)
+            self.poll_schedule.pushed = (
+                self.eventsub.covered('stream.online') & self.eventsub.covered('stream.offline')
+            )
+            due = self.poll_schedule.pop_due(watched=channels)
+            if not due:
+                return
 
-            # streams that ended
-            for ended in self.live_channels - now_live:
-                await self._on_stream_end(ended)
+            streams  = await deadline.run(self._fetch_live_streams(due))   # live only
+            now_live = {s.user.name.lower() for s in streams}
 
-            self.live_channels = now_live
+            # newly-started streams; one whose start misses the deadline or
+            # fails never makes it into live_channels, so the next poll
+            # starts it again
+            started = [s for s in streams if s.user.name.lower() not in self.live_channels]
+            if started:
+                try:
+                    await deadline.run(self._on_streams_start(started))
+                except asyncio.TimeoutError:
+                    print(f"[metrics_collector] tick deadline hit while starting "
+                          f"{len(started)} stream(s)")
+
+            # per-stream polling metrics, at most once per METRICS_INC per channel
+            now = time.monotonic()
+            sample = [
+                s for s in streams
+                if now - self._last_polled_at.get(s.user.name.lower(), 0.0) >= METRICS_INC
+            ]
+            for s in sample:
+                self._last_polled_at[s.user.name.lower()] = now
+            await self._collect_polling_metrics(sample, deadline)
+
+            # streams that ended (only channels checked this tick can have ended);
+            # ones that fail, run out of time or are still being ended by
+            # EventSub stay live and are checked again right away
+            for ended in (self.live_channels & set(due)) - now_live:
+                try:
+                    await deadline.run(self._on_stream_end(ended))
+                    self._last_polled_at.pop(ended, None)
+                except Exception as e:
+                    print(f"[{ended}] stream end deferred: {type(e).__name__}: {e}")
+                if ended in self.live_channels:
+                    pending_end.add(ended)
         except Exception as e:
             import traceback
             print(f"[metrics_collector] tick failed: {type(e).__name__}: {e}")
-            traceback.print_exc()
+            if not isinstance(e, (asyncio.TimeoutError, CircuitOpenError)):
+                traceback.print_exc()
+            # keep the previous state for channels we could not check
+            now_live = self.live_channels & set(due)
+        finally:
+            for chan in due:
+                self.poll_schedule.reschedule(chan, live=chan in now_live)
+            for chan in pending_end:
+                self.poll_schedule.poll_now(chan)
+
+    # ─────────────────────────  HELIX LOOKUPS  ──────────────────────────────
+    # Stream lookups go through self.helix (and its rate limiter) rather than
+    # TwitchIO's own HTTP client; the payloads are wrapped in the usual
+    # TwitchIO models so the rest of the bot is unchanged.
+    async def _fetch_live_streams(self, channels: list[str]) -> list[Stream]:
+        data = await self.helix.get_streams(channels)
+        return [Stream(self._http, x) for x in data]
+
+    # ─────────────────────────  RESTART  ────────────────────────────────────
+    async def _resume_live_sessions(self, channels: list[str]):
+        """Pick up every session that was live before a restart, all at once.
+
+        One streams lookup for all *channels* and one live_stream_latest
+        query; a channel whose stored row belongs to the stream that is live
+        now is rehydrated from it, and their drafts are restored together.
+        The rest (offline, a new stream, rows without a stream id) are left
+        to the polling loop's normal stream start.
+        """
+        chans = [c for c in channels if c not in self.stats_by_channel]
+        if not chans:
+            return
+        try:
+            streams   = await self._fetch_live_streams(chans)
+            last_rows = await self.botdb.run(
+                self._latest_snapshots, [s.user.name.lower() for s in streams]
+            )
+        except Exception as e:
+            print(f"[resume] skipped: {type(e).__name__}: {e}")
+            return
+
+        resumed = {}
+        for live in streams:
+            chan = live.user.name.lower()
+            last = last_rows.get(chan)
+            if last is None or last.stream_id != _stream_id(live) or chan in self.stats_by_channel:
+                continue
+            self.meta.observe(chan, live.user.id)
+            self._resume(chan, last)
+            resumed[chan] = (last.stream_date, last.stream_start_time)
+        if resumed:
+            await self.drafts.restore(resumed)
+            print(f"[resume] {len(resumed)} live session(s) rehydrated from DB")
+
+    def _resume(self, chan: str, last: LatestSnapshot):
+        """Carry on *chan*'s session from its stored snapshot *last*."""
+        self.stats_by_channel[chan] = self._rehydrate_stats(last)
+        self.snapshots.remember(chan, last)
+        self._last_sent_at[chan] = datetime.utcnow()
+        self.live_channels.add(chan)
 
     # ─────────────────────────  STREAM START  ───────────────────────────────
     async def _on_stream_start(self, live):
+        await self._on_streams_start([live])
+
+    async def _on_streams_start(self, streams):
+        """Start tracking every stream that went live this tick in one batch.
+
+        Broadcaster ids and tags come from the metadata cache (at most one
+        users lookup for channels it has never seen), the follower counts
+        and tags are fetched concurrently and a single query finds the
+        snapshots to rehydrate from.
+        """
+        # EventSub and the polling loop can both report the same go-live
+        streams = [s for s in streams if s.user.name.lower() not in self._starting]
+        if not streams:
+            return
+        claimed = {s.user.name.lower() for s in streams}
+        self._starting |= claimed
+        try:
+            await self._start_streams(streams)
+        finally:
+            self._starting -= claimed
+
+    async def _start_streams(self, streams):
         try:
             # Twitch provides the actual stream start time; use it for accuracy.
             # Falling back to "now" can cause drift and, with the rehydrate
             # logic below, may mistakenly re-use an old start time.
-            start   = live.started_at.replace(tzinfo=pytz.utc).astimezone(EST)
-            chan    = live.user.name.lower()
-            user    = (await self.fetch_users(names=[chan]))[0]
-            global REFRESH_TOKEN
-            token, REFRESH_TOKEN = get_oauth_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
-            # update the bot's tokens so future refreshes succeed
-            self._http.token = token
-            self._http._refresh_token = REFRESH_TOKEN
-            f_cnt   = await fetch_follower_count(user.id, token)
-
-            try:
-                tag_names = await fetch_stream_tags(user.id, token)
-            except Exception as e:
-                print(f"[{chan}] failed to fetch tags: {e}")
-                tag_names = []
-
-            # Attempt to rehydrate existing stats to avoid data loss after restart
-            from main import app
-            with app.app_context():
-                last = (
-                    TimeSeries.query
-                    .filter_by(stream_name=chan, stream_date=start.date())
-                    .order_by(TimeSeries.id.desc())
-                    .first()
+            starts = {
+                s.user.name.lower(): (s, s.started_at.replace(tzinfo=pytz.utc).astimezone(EST))
+                for s in streams
+            }
+            chans = list(starts)
+            for chan, (live, _) in starts.items():
+                self.meta.observe(chan, live.user.id)
+            metas = await self.meta.resolve(chans)
+
+            async def _lookups(chan):
+                f_cnt = await self.helix.fetch_follower_count(
+                    metas[chan]["broadcaster_id"], priority=PRIORITY_START
                 )
-
-            if last:
-                # Only rehydrate if the last snapshot belongs to this stream.
-                last_start = datetime.combine(last.stream_date, last.stream_start_time)
-                if last_start.tzinfo is None:
-                    last_start = EST.localize(last_start)
-                if abs((start - last_start).total_seconds()) <= 15 * 60:
-                    stats = self._rehydrate_stats(last)
-                    stats['followers_end'] = f_cnt
-                    stats['tags'] = tag_names
-                    self.stats_by_channel[chan] = stats
-                    print(f"[{chan}] stream resumed – rehydrated from DB")
-                else:
-                    last = None
-
-            if not last:
-                stats = {
-                    'stream_name':            chan,
-                    'stream_date':            start.date(),
-                    'start_time':             start,
-                    'viewer_counts':          [],
-                    'unique_chatters':        set(),
-                    'emote_set':              set(),
-                    'total_num_chats':        0,
-                    'followers_start':        f_cnt,
-                    'followers_end':          f_cnt,
-                    'new_subscriptions_t1':   0,
-                    'new_subscriptions_t2_t3':0,
-                    'resubscriptions':        0,
-                    'gifted_subs_received':   0,
-                    'gifted_subs_given':      0,
-                    'subscription_cancellations': 0,
-                    'bits_donated':           0,
-                    'donation_events_count':  0,
-                    'total_donation_amount':  0.0,
-                    'raids_received':         0,
-                    'raid_viewers_received':  0,
-                    'polls_run':              0,
-                    'poll_participation':     0,
-                    'predictions_run':        0,
-                    'prediction_participants':0,
-                    'game_category':          live.game_name or "Unknown",
-                    'category_changes':       0,
-                    'title_length':           len(live.title or ""),
-                    'has_giveaway':           False,
-                    'has_qna':                False,
-                    'tags':                   tag_names,
-                    'moderation_actions':     0,
-                    'messages_deleted':       0,
-                    'timeouts_bans':          0,
-                    'avg_sentiment_score':    0.5,
-                    'min_sentiment_score':    0.5,
-                    'max_sentiment_score':    0.5,
-                    'sentiment_scores':       [],
-                    'positive_negative_ratio':None,
-                    'gift_subs_bool':         False,
-                }
-                self.stats_by_channel[chan] = stats
-                print(f"[{chan}] stream started – tracking…")
-
-            self._last_sent_at[chan] = datetime.utcnow()
-            self.live_channels.add(chan)
+                try:
+                    tag_names = await self.meta.tags(chan)
+                except Exception as e:
+                    print(f"[{chan}] failed to fetch tags: {e}")
+                    tag_names = []
+                return f_cnt, tag_names
+
+            ready = [c for c in chans if c in metas]
+            results = await asyncio.gather(*(_lookups(c) for c in ready), return_exceptions=True)
+
+            # Attempt to rehydrate existing stats to avoid data loss after restart;
+            # the same rows seed the snapshot writer's last-row index
+            last_rows = await self.botdb.run(self._latest_snapshots, ready)
+            for chan in ready:
+                self.snapshots.remember(chan, last_rows.get(chan))
         except Exception:
             import traceback; traceback.print_exc()
+            return
+
+        for chan, res in zip(ready, results):
+            if isinstance(res, Exception):
+                print(f"[{chan}] stream start failed: {type(res).__name__}: {res}")
+                continue
+            live, start = starts[chan]
+            f_cnt, tag_names = res
+            self._start_tracking(live, start, f_cnt, tag_names, last_rows.get(chan))
+
+        # sessions picked up after a restart continue their checkpointed draft
+        await self.drafts.restore({
+            chan: (stats['stream_date'], stats['start_time'].time())
+            for chan in ready
+            if last_rows.get(chan) and (stats := self.stats_by_channel.get(chan))
+        })
+
+    @staticmethod
+    def _latest_snapshots(session, chans: list[str]) -> dict[str, LatestSnapshot]:
+        """Newest snapshot for each channel, from live_stream_latest."""
+        if not chans:
+            return {}
+        rows = session.query(LatestSnapshot).filter(LatestSnapshot.stream_name.in_(chans)).all()
+        return {r.stream_name: r for r in rows}
+
+    def _start_tracking(self, live, start, f_cnt, tag_names, last):
+        chan = live.user.name.lower()
+        if last:
+            # Only rehydrate if the last snapshot belongs to this stream.
+            if last.stream_id is not None:
+                same_stream = last.stream_id == _stream_id(live)
+            else:
+                # row from before stream ids were recorded: match on start time
+                last_start = EST.localize(datetime.combine(last.stream_date, last.stream_start_time))
+                same_stream = abs((start - last_start).total_seconds()) <= 15 * 60
+            if same_stream:
+                stats = self._rehydrate_stats(last)
+                stats['stream_id'] = _stream_id(live)
+                stats['followers_end'] = f_cnt
+                stats['tags'] = tag_names
+                self.stats_by_channel[chan] = stats
+                print(f"[{chan}] stream resumed – rehydrated from DB")
+            else:
+                last = None
+
+        if not last:
+            stats = {
+                'stream_name':            chan,
+                'stream_id':              _stream_id(live),
+                'stream_date':            start.date(),
+                'start_time':             start,
+                'viewer_counts':          [],
+                'unique_chatters':        set(),
+                'emote_set':              set(),
+                'total_num_chats':        0,
+                'followers_start':        f_cnt,
+                'followers_end':          f_cnt,
+                'new_subscriptions_t1':   0,
+                'new_subscriptions_t2_t3':0,
+                'resubscriptions':        0,
+                'gifted_subs_received':   0,
+                'gifted_subs_given':      0,
+                'subscription_cancellations': 0,
+                'bits_donated':           0,
+                'donation_events_count':  0,
+                'total_donation_amount':  0.0,
+                'raids_received':         0,
+                'raid_viewers_received':  0,
+                'polls_run':              0,
+                'poll_participation':     0,
+                'predictions_run':        0,
+                'prediction_participants':0,
+                'game_category':          live.game_name or "Unknown",
+                'category_changes':       0,
+                'title_length':           len(live.title or ""),
+                'has_giveaway':           False,
+                'has_qna':                False,
+                'tags':                   tag_names,
+                'moderation_actions':     0,
+                'messages_deleted':       0,
+                'timeouts_bans':          0,
+                'avg_sentiment_score':    0.5,
+                'min_sentiment_score':    0.5,
+                'max_sentiment_score':    0.5,
+                'sentiment_scores':       [],
+                'positive_negative_ratio':None,
+                'gift_subs_bool':         False,
+            }
+            self.stats_by_channel[chan] = stats
+            print(f"[{chan}] stream started – tracking…")
+
+        # everything fetched above counts as this channel's first refresh
+        now = time.monotonic()
+        self._forget_refresh(chan)
+        self.follower_trend.add(chan, now, f_cnt)
+        self.refresh['followers'].done(chan, now, f_cnt)
+        self.refresh['tags'].done(chan, now, tuple(tag_names))
+        self.refresh['title'].done(chan, now, live.title)
+        self._apply_title(stats, live.title)
+
+        self._last_sent_at[chan] = datetime.utcnow()
+        self.live_channels.add(chan)
+
+    @staticmethod
+    def _apply_title(stats: dict, title: str | None):
+        title = title or ""
+        stats['title_length'] = len(title)
+        stats['has_giveaway'] = 'giveaway' in title.lower()
+        stats['has_qna']      = bool(re.search(r"\bq\s*(?:&|and)\s*a\b", title, re.IGNORECASE))
+
+    def _forget_refresh(self, chan: str):
+        for policy in self.refresh.values():
+            policy.forget(chan)
+        self.follower_trend.forget(chan)
+
+    # ─────────────────────────  EVENTSUB  ───────────────────────────────────
+    async def _eventsub_online(self, event: dict):
+        chan = event['broadcaster_user_login'].lower()
+        if chan in self.live_channels:
+            return
+        streams = await self._fetch_live_streams([chan])
+        if not streams:
+            # Helix can lag the push by a few seconds – let the scheduler retry
+            self.poll_schedule.poll_now(chan)
+            return
+        await self._on_streams_start(streams)
+        self.poll_schedule.reschedule(chan, live=True)
+
+    async def _eventsub_offline(self, event: dict):
+        chan = event['broadcaster_user_login'].lower()
+        if chan in self.live_channels:
+            await self._on_stream_end(chan)
+            self._last_polled_at.pop(chan, None)
+        self.poll_schedule.reschedule(chan, live=False)
+
+    async def _eventsub_follow(self, event: dict):
+        chan  = event['broadcaster_user_login'].lower()
+        stats = self.stats_by_channel.get(chan)
+        if stats:
+            stats['followers_end'] += 1
 
     # ─────────────────────────  LIVE POLLING  ───────────────────────────────
-    async def _collect_polling_metrics(self, streams):
-        global OAUTH_TOKEN, REFRESH_TOKEN
-        now = datetime.utcnow()
+    async def _collect_polling_metrics(self, streams, deadline: Deadline | None = None):
+        """Poll every live channel concurrently, at most POLL_CONCURRENCY at once.
+
+        Each channel runs in isolation: an exception in one is logged and does
+        not abort the rest of the tick. Channels still running when *deadline*
+        passes are cancelled (their snapshot is skipped, not half-written) and
+        become due again on the next tick.
+        """
+        if not streams:
+            return
+        sem = asyncio.Semaphore(POLL_CONCURRENCY)
 
-        for live in streams:
-            chan  = live.user.name.lower()
-            stats = self.stats_by_channel.get(chan)
-            if not stats:
-                from main import app
-                with app.app_context():
-                    last = (
-                        TimeSeries.query
-                        .filter_by(stream_name=chan, stream_date=datetime.now(EST).date())
-                        .order_by(TimeSeries.id.desc())
-                        .first()
-                    )
-                if last:
-                    stats = self._rehydrate_stats(last)
-                    self.stats_by_channel[chan] = stats
-                    self._last_sent_at[chan] = datetime.utcnow()
-                    self.live_channels.add(chan)
-                else:
-                    continue
+        async def _guarded(live):
+            async with sem:
+                await self._poll_channel(live)
 
-            # raw samples
-            stats['viewer_counts'].append(live.viewer_count)
+        tasks = {asyncio.create_task(_guarded(s)): s for s in streams}
+        done, pending = await asyncio.wait(
+            tasks, timeout=deadline.remaining if deadline else None
+        )
+        for task in pending:
+            task.cancel()
+            chan = tasks[task].user.name.lower()
+            self._last_polled_at.pop(chan, None)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            print(f"[metrics_collector] tick deadline hit; {len(pending)} channel(s) not polled")
+        for task in done:
+            if task.exception() is not None:
+                res = task.exception()
+                print(f"[{tasks[task].user.name.lower()}] polling failed: {type(res).__name__}: {res}")
+
+    async def _fetch_followers(self, broadcaster_id: str) -> int | None:
+        # expired tokens are refreshed (and retried) inside the Helix client;
+        # on failure the caller keeps the trend estimate
+        try:
+            return await self.helix.fetch_follower_count(broadcaster_id)
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+            print(f"[followers] {broadcaster_id}: {type(e).__name__}: {e}")
+            return None
 
-            # refresh follower token when necessary
-            try:
-                stats['followers_end'] = await fetch_follower_count(
-                    live.user.id, OAUTH_TOKEN
-                )
-            except aiohttp.ClientResponseError as e:
-                if e.status in (401, 403):
-                    # token likely expired – refresh and retry once
-                    OAUTH_TOKEN, REFRESH_TOKEN = get_oauth_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
-                    self._http.token = OAUTH_TOKEN
-                    self._http._refresh_token = REFRESH_TOKEN
-                    try:
-                        stats['followers_end'] = await fetch_follower_count(
-                            live.user.id, OAUTH_TOKEN
-                        )
-                    except aiohttp.ClientResponseError:
-                        pass
-                else:
-                    pass
-
-            # sentiment every 20 min
-            # if now - self._last_sent_at[chan] >= self.SENTIMENT_INTERVAL:
-            #     stats['avg_sentiment_score'] = await self.calculate_avg_sentiment_score(stats, chan)
-            #     self._last_sent_at[chan]     = now
-
-            # derived viewer / chat metrics
-            duration_min = (datetime.now(EST) - stats['start_time']).total_seconds() / 60
-            stats['stream_duration'] = int(duration_min)
-
-            if stats['viewer_counts']:
-                counts = stats['viewer_counts']
-                # Ignore the first and last five minutes to avoid early spikes
-                # as viewers join and drops when the stream winds down.
-                trimmed_counts = counts[5:-5] if len(counts) > 10 else []
-
-                if trimmed_counts:
-                    avg_v  = sum(trimmed_counts) / len(trimmed_counts)
-                    peak_v = max(trimmed_counts)
-                    first_v = next((v for v in trimmed_counts if v > 0), trimmed_counts[0])
-                    stats['avg_concurrent_viewers'] = avg_v
-                    stats['peak_concurrent_viewers'] = peak_v
-                    stats['viewer_growth_rate'] = (peak_v - first_v) / (first_v or 1)
-                else:
-                    stats['avg_concurrent_viewers'] = 0
-                    stats['peak_concurrent_viewers'] = 0
-                    stats['viewer_growth_rate'] = 0.0
+    async def _poll_channel(self, live):
+        chan  = live.user.name.lower()
+        stats = self.stats_by_channel.get(chan)
+        if not stats:
+            last = (await self.botdb.run(self._latest_snapshots, [chan])).get(chan)
+            if last and last.stream_id == _stream_id(live):
+                self._resume(chan, last)
+                stats = self.stats_by_channel[chan]
+                await self.drafts.restore({chan: (last.stream_date, last.stream_start_time)})
+            else:
+                return
+
+        # raw samples – viewers come with the streams payload, so every poll
+        stats['viewer_counts'].append(live.viewer_count)
+        now_mono = time.monotonic()
+
+        # followers: where channel.follow is pushed, the follow events alone
+        # move the count; elsewhere a real fetch every FOLLOWER_REFRESH and
+        # the trend estimate in between
+        if chan in self.eventsub.covered('channel.follow'):
+            pass
+        elif self.refresh['followers'].due(chan, now_mono):
+            f_cnt = await self._fetch_followers(live.user.id)
+            if f_cnt is not None:
+                stats['followers_end'] = f_cnt
+                self.follower_trend.add(chan, now_mono, f_cnt)
+                self.refresh['followers'].done(chan, now_mono, f_cnt)
+        else:
+            estimate = self.follower_trend.estimate(chan, now_mono)
+            if estimate is not None:
+                stats['followers_end'] = estimate
+
+        # title / tags: free in the streams payload, applied on a slow cycle
+        if self.refresh['title'].due(chan, now_mono):
+            if self.refresh['title'].done(chan, now_mono, live.title):
+                self._apply_title(stats, live.title)
+        if self.refresh['tags'].due(chan, now_mono):
+            tags = live.tags
+            if tags is None:
+                try:
+                    tags = await self.meta.tags(chan)
+                except Exception as e:
+                    print(f"[{chan}] failed to fetch tags: {type(e).__name__}: {e}")
+            if tags is not None and self.refresh['tags'].done(chan, now_mono, tuple(tags)):
+                stats['tags'] = list(tags)
+
+        # sentiment every 20 min
+        # now = datetime.utcnow()
+        # if now - self._last_sent_at[chan] >= self.SENTIMENT_INTERVAL:
+        #     stats['avg_sentiment_score'] = await self.calculate_avg_sentiment_score(stats, chan)
+        #     self._last_sent_at[chan]     = now
+
+        # derived viewer / chat metrics
+        duration_min = (datetime.now(EST) - stats['start_time']).total_seconds() / 60
+        stats['stream_duration'] = int(duration_min)
+
+        if stats['viewer_counts']:
+            counts = stats['viewer_counts']
+            # Ignore the first and last five minutes to avoid early spikes
+            # as viewers join and drops when the stream winds down.
+            trimmed_counts = counts[5:-5] if len(counts) > 10 else []
+
+            if trimmed_counts:
+                avg_v  = sum(trimmed_counts) / len(trimmed_counts)
+                peak_v = max(trimmed_counts)
+                first_v = next((v for v in trimmed_counts if v > 0), trimmed_counts[0])
+                stats['avg_concurrent_viewers'] = avg_v
+                stats['peak_concurrent_viewers'] = peak_v
+                stats['viewer_growth_rate'] = (peak_v - first_v) / (first_v or 1)
             else:
                 stats['avg_concurrent_viewers'] = 0
                 stats['peak_concurrent_viewers'] = 0
                 stats['viewer_growth_rate'] = 0.0
+        else:
+            stats['avg_concurrent_viewers'] = 0
+            stats['peak_concurrent_viewers'] = 0
+            stats['viewer_growth_rate'] = 0.0
+
+        uniq_chatters                = len(stats['unique_chatters'])
+        stats['unique_viewers']       = uniq_chatters
+        stats['total_chatters']       = uniq_chatters
+        stats['chat_msgs_per_minute'] = stats['total_num_chats'] / (duration_min or 1)
+
+        # emote metrics
+        stats['total_emotes_used']   = sum(len(e.split(":")) for e in stats['emote_set'])
+        stats['unique_emotes_used']  = len(stats['emote_set'])
+
+        # subs & follower deltas
+        total_subs = (
+            stats['new_subscriptions_t1']
+            + stats['new_subscriptions_t2_t3']
+            + stats['resubscriptions']
+            + stats['gifted_subs_received']
+            - stats['gifted_subs_given']
+            - stats['subscription_cancellations']
+        )
+        stats['total_subscriptions']   = total_subs
+        stats['net_follower_change']   = stats['followers_end'] - stats['followers_start']
+        stats['subs_per_avg_viewer']   = total_subs / (stats['avg_concurrent_viewers'] or 1)
+        stats['chat_msgs_per_viewer']  = stats['total_num_chats'] / (uniq_chatters or 1)
 
-            uniq_chatters                = len(stats['unique_chatters'])
-            stats['unique_viewers']       = uniq_chatters
-            stats['total_chatters']       = uniq_chatters
-            stats['chat_msgs_per_minute'] = stats['total_num_chats'] / (duration_min or 1)
-
-            # emote metrics
-            stats['total_emotes_used']   = sum(len(e.split(":")) for e in stats['emote_set'])
-            stats['unique_emotes_used']  = len(stats['emote_set'])
-
-            # subs & follower deltas
-            total_subs = (
-                stats['new_subscriptions_t1']
-                + stats['new_subscriptions_t2_t3']
-                + stats['resubscriptions']
-                + stats['gifted_subs_received']
-                - stats['gifted_subs_given']
-                - stats['subscription_cancellations']
-            )
-            stats['total_subscriptions']   = total_subs
-            stats['net_follower_change']   = stats['followers_end'] - stats['followers_start']
-            stats['subs_per_avg_viewer']   = total_subs / (stats['avg_concurrent_viewers'] or 1)
-            stats['chat_msgs_per_viewer']  = stats['total_num_chats'] / (uniq_chatters or 1)
-
-            if stats['game_category'] != live.game_name:
-                stats['game_category'] = live.game_name
-                stats['category_changes'] += 1
+        if stats['game_category'] != live.game_name:
+            stats['game_category'] = live.game_name
+            stats['category_changes'] += 1
 
-            await self.live_stream_data(chan)
+        await self.live_stream_data(chan)
 
     # ─────────────────────────  STREAM END  ───────────────────────────────
-    async def _on_stream_end(self, chan: str):
-        from main import app
-
-        with app.app_context():
-            # Fetch the latest snapshot to determine the current stream date,
-            # then restrict the aggregation to rows from that date only.
-            last = (
-                TimeSeries.query
-                .filter_by(stream_name=chan)
-                .order_by(TimeSeries.id.desc())
-                .first()
-            )
-            if not last:
-                print()
-                print('No last. returning')
-                print()
-                return
-
-            current_date = last.stream_date
-            rows = (
-                TimeSeries.query
-                .filter_by(stream_name=chan, stream_date=current_date)
-                .order_by(TimeSeries.id)
-                .all()
-            )
-
-
-            first = (
-                TimeSeries.query
-                .filter_by(stream_name=chan, stream_date=last.stream_date)
-                .order_by(TimeSeries.id)
-                .first()
-            )
-            if not first:
-                print()
-                print('No first. returning')
-                print()
-                return
-
-            # sentiment stats across all snapshots
-            avg_sent, min_sent, max_sent = db.session.query(
-                func.avg(TimeSeries.avg_sentiment_score),
-                func.min(TimeSeries.avg_sentiment_score),
-                func.max(TimeSeries.avg_sentiment_score),
-            ).filter_by(stream_name=chan, stream_date=last.stream_date).first()
-
-            prev = (
-                DailyStats.query
-                .filter_by(stream_name=chan)
-                .order_by(
-                    DailyStats.stream_date.desc(),
-                    DailyStats.stream_start_time.desc(),
-                )
-                .first()
-            )
-
-            days_since = (last.stream_date - prev.stream_date).days if prev else 0
-            seven_days_ago = last.stream_date - timedelta(days=7)
-            three_days_ago = last.stream_date - timedelta(days=3)
+    async def _settle_followers(self, chan: str):
+        """Put a real follower count in the session's final snapshot.
+
+        Between fetches followers_end is a trend estimate, which must not
+        reach the rollup: fetch the count once more (falling back to the last
+        real sample) and, if it differs, write one more snapshot with it.
+        EventSub follow events keep an exact count, so those channels are left
+        alone.
+        """
+        stats = self.stats_by_channel.get(chan)
+        if stats is None or chan in self.eventsub.covered('channel.follow'):
+            return
+        f_cnt = None
+        try:
+            meta = (await self.meta.resolve([chan])).get(chan)
+            if meta and meta['broadcaster_id']:
+                f_cnt = await self._fetch_followers(meta['broadcaster_id'])
+        except Exception as e:
+            print(f"[{chan}] final follower count: {type(e).__name__}: {e}")
+        if f_cnt is None:
+            f_cnt = self.follower_trend.last(chan)
+        if f_cnt is None or f_cnt == stats['followers_end']:
+            return
+        stats['followers_end']       = f_cnt
+        stats['net_follower_change'] = f_cnt - stats['followers_start']
+        await self.live_stream_data(chan)
 
-            avg_subs_7 = (
-                db.session.query(func.avg(DailyStats.total_subscriptions))
-                .filter(
-                    DailyStats.stream_name == chan,
-                    DailyStats.stream_date >= seven_days_ago,
-                    DailyStats.stream_date < last.stream_date,
-                )
-                .scalar()
-            )
-            avg_subs_3 = (
-                db.session.query(func.avg(DailyStats.total_subscriptions))
-                .filter(
-                    DailyStats.stream_name == chan,
-                    DailyStats.stream_date >= three_days_ago,
-                    DailyStats.stream_date < last.stream_date,
-                )
-                .scalar()
-            )
-            viewers_3d_moving_avg = (
-                db.session.query(func.avg(DailyStats.avg_concurrent_viewers))
-                .filter(
-                    DailyStats.stream_name == chan,
-                    DailyStats.stream_date >= three_days_ago,
-                    DailyStats.stream_date < last.stream_date,
-                )
-                .scalar()
-            )
+    async def _on_stream_end(self, chan: str):
+        """Finish *chan*'s session, once.
 
-            prev_peak = prev.peak_concurrent_viewers if prev else last.peak_concurrent_viewers
-            day_over_day_peak_change = last.peak_concurrent_viewers - prev_peak
-
-            daily = DailyStats(
-                stream_name               = chan,
-                stream_date               = last.stream_date,
-                day_of_week               = last.stream_date.strftime("%A"),
-                is_weekend                = last.stream_date.weekday() >= 5,
-                is_holiday                = last.stream_date in US_HOLIDAYS,
-                stream_start_time         = first.stream_start_time,
-                days_since_previous_stream= days_since,
-                stream_duration           = last.stream_duration,
-                avg_concurrent_viewers    = last.avg_concurrent_viewers,
-                peak_concurrent_viewers   = last.peak_concurrent_viewers,
-                unique_viewers            = last.unique_viewers,
-                viewer_growth_rate        = last.viewer_growth_rate,
-                total_num_chats           = last.total_num_chats,
-                total_chatters            = last.total_chatters,
-                chat_msgs_per_minute      = last.chat_msgs_per_minute,
-                total_emotes_used         = last.total_emotes_used,
-                unique_emotes_used        = last.unique_emotes_used,
-                followers_start           = first.followers_start,
-                followers_end             = last.followers_end,
-                net_follower_change       = last.net_follower_change,
-                total_subscriptions       = last.total_subscriptions,
-                new_subscriptions_t1      = last.new_subscriptions_t1,
-                new_subscriptions_t2_t3   = last.new_subscriptions_t2_t3,
-                resubscriptions           = last.resubscriptions,
-                gifted_subs_received      = last.gifted_subs_received,
-                gifted_subs_given         = last.gifted_subs_given,
-                subscription_cancellations= last.subscription_cancellations,
-                bits_donated              = last.bits_donated,
-                donation_events_count     = last.donation_events_count,
-                total_donation_amount     = last.total_donation_amount,
-                raids_received            = last.raids_received,
-                raid_viewers_received     = last.raid_viewers_received,
-                polls_run                 = last.polls_run,
-                poll_participation        = last.poll_participation,
-                predictions_run           = last.predictions_run,
-                prediction_participants   = last.prediction_participants,
-                game_category             = last.game_category,
-                category_changes          = last.category_changes,
-                title_length              = last.title_length,
-                has_giveaway              = last.has_giveaway,
-                has_qna                   = last.has_qna,
-                tags                      = last.tags,
-                moderation_actions        = last.moderation_actions,
-                messages_deleted          = last.messages_deleted,
-                timeouts_bans             = last.timeouts_bans,
-                avg_sentiment_score       = float(avg_sent) if avg_sent is not None else None,
-                min_sentiment_score       = min_sent,
-                max_sentiment_score       = max_sent,
-                positive_negative_ratio   = last.positive_negative_ratio,
-                subs_per_avg_viewer       = last.subs_per_avg_viewer,
-                chat_msgs_per_viewer      = last.chat_msgs_per_viewer,
-                subs_7d_moving_avg        = float(avg_subs_7) if avg_subs_7 is not None else None,
-                subs_3d_moving_avg        = float(avg_subs_3) if avg_subs_3 is not None else None,
-                viewers_3d_moving_avg     = float(viewers_3d_moving_avg) if viewers_3d_moving_avg is not None else None,
-                day_over_day_peak_change  = day_over_day_peak_change,
-                gift_subs_bool            = last.gift_subs_bool,
-            )
-            # Validate required (non-nullable) fields before committing
-            required_cols = [
-                c.name for c in DailyStats.__table__.columns
-                if not c.nullable and not c.primary_key
-            ]
-            missing = [col for col in required_cols if getattr(daily, col) is None]
-            if missing:
-                print(f"[Stream session for {chan}] missing data for: {', '.join(missing)}. Stats not committed.")
-            else:
-                try:
-                    existing = (
-                        DailyStats.query
-                        .filter_by(
-                            stream_name=chan,
-                            stream_date=last.stream_date,
-                            stream_start_time=first.stream_start_time,
-                        )
-                        .order_by(DailyStats.id.desc())
-                        .first()
-                    )
-
-                    if existing:
-                        existing_duration = existing.stream_duration if existing.stream_duration is not None else -1
-                        new_duration = daily.stream_duration if daily.stream_duration is not None else -1
-
-                        # Keep whichever row appears to be the most complete session summary.
-                        # This prevents duplicate (stream_name, stream_date, stream_start_time) rows when
-                        # the end-of-stream handler runs more than once (disconnect/reconnect, etc.).
-                        if new_duration <= existing_duration:
-                            print(
-                                f"[Stream session for {chan}] daily_stats already present (id={existing.id}); "
-                                f"keeping existing duration={existing_duration} >= new duration={new_duration}"
-                            )
-                        else:
-                            for col in DailyStats.__table__.columns:
-                                if col.primary_key:
-                                    continue
-                                setattr(existing, col.name, getattr(daily, col.name))
-                            db.session.commit()
-                            print(
-                                f"[Stream session for {chan}] updated existing daily_stats row (id={existing.id}) "
-                                f"with longer duration={new_duration}"
-                            )
-                    else:
-                        db.session.add(daily)
-                        db.session.commit()
-                        print(f"[Stream session for {chan}] stats committed to DB")
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"[Stream session for {chan}] commit failed: {e}")
+        EventSub and the polling loop can both report the same stream
+        ending; the second caller finds it claimed (or no longer live) and
+        returns, rather than rolling it up again from whatever is left.
+        """
+        if chan in self._ending or chan not in self.live_channels:
+            return
+        self._ending.add(chan)
+        try:
+            await self._end_stream(chan)
+        finally:
+            self._ending.discard(chan)
+
+    async def _end_stream(self, chan: str):
+        await self._settle_followers(chan)
+        # the session's last snapshot may be held back as unchanged; queue it
+        # (and fold it into the draft) so both end on the final duration
+        held = self.snapshots.end(chan)
+        if held is not None:
+            self.drafts.update(held)
+        # the session's draft already holds everything the rollup needs;
+        # without one (e.g. no checkpoint survived a restart) the rollup
+        # reads the snapshots back, so write any still buffered
+        summary = self.drafts.summary(chan)
+        if summary is None:
+            await self.snapshots.flush()
+        stream_id = self.stats_by_channel.get(chan, {}).get('stream_id')
+        # the rollup is blocking DB work; it runs off the event loop under the
+        # db timeout / circuit breaker, and a failure leaves the channel live
+        # so the next tick retries it
+        if not await self.botdb.run(self._finalize_stream, chan, summary, stream_id):
+            return
+        self.drafts.discard(chan)
+        self.retention.wake()
 
         # clean-up
         self.stats_by_channel.pop(chan, None)
         self._last_sent_at.pop(chan, None)
+        self._forget_refresh(chan)
         self.live_channels.discard(chan)
 
         # Reset event caches when no streams remain to prevent unbounded growth
@@ -700,7 +855,200 @@ class StatsBot(commands.Bot):
             self.processed_events.clear()
             self.bulk_gift_ids.clear()
 
-
+    @staticmethod
+    def _scan_session(session, chan: str, stream_id: int | None = None):
+        """The session summary rebuilt from live_stream, for when there is no draft.
+
+        The newest snapshot of the Twitch stream *stream_id* (without one, of
+        the channel's current stream date), with the session's first start
+        time / follower count and sentiment range computed alongside it by
+        window functions; None without snapshots.
+        """
+        if stream_id is not None:
+            in_session = Snapshot.stream_id == stream_id
+        else:
+            current_date = (
+                select(Snapshot.stream_date)
+                .where(Snapshot.stream_name == chan)
+                .order_by(Snapshot.id.desc())
+                .limit(1)
+                .scalar_subquery()
+            )
+            in_session = and_(Snapshot.stream_name == chan, Snapshot.stream_date == current_date)
+        snaps = (
+            select(
+                Snapshot,
+                func.first_value(Snapshot.stream_start_time, type_=Snapshot.stream_start_time.type)
+                    .over(order_by=Snapshot.id).label("first_start_time"),
+                func.first_value(Snapshot.followers_start, type_=Snapshot.followers_start.type)
+                    .over(order_by=Snapshot.id).label("first_followers_start"),
+                func.avg(Snapshot.avg_sentiment_score).over().label("sentiment_avg"),
+                func.min(Snapshot.avg_sentiment_score).over().label("sentiment_min"),
+                func.max(Snapshot.avg_sentiment_score).over().label("sentiment_max"),
+                func.row_number().over(order_by=Snapshot.id.desc()).label("newest"),
+            )
+            .where(in_session)
+            .subquery()
+        )
+        return session.execute(select(snaps).where(snaps.c.newest == 1)).first()
+
+    def _finalize_stream(self, session, chan: str, last=None, stream_id: int | None = None) -> bool:
+        """Write the DailyStats row for *chan*'s finished session; False if there is none.
+
+        *last* is the session summary from the draft (StreamDrafts.summary);
+        without it the session (the Twitch stream *stream_id*, if known) is
+        read back from live_stream.
+        """
+        if last is None:
+            last = self._scan_session(session, chan, stream_id)
+        if not last:
+            print()
+            print('No last. returning')
+            print()
+            return False
+
+        # previous session and moving averages, in one aggregate over the
+        # last seven days
+        seven_days_ago = last.stream_date - timedelta(days=7)
+        three_days_ago = last.stream_date - timedelta(days=3)
+        recent_3d = DailyStats.stream_date >= three_days_ago
+        prev = (
+            select(DailyStats.stream_date)
+            .where(DailyStats.stream_name == chan)
+            .order_by(DailyStats.stream_date.desc(), DailyStats.stream_start_time.desc())
+            .limit(1)
+        )
+        history = session.execute(
+            select(
+                prev.scalar_subquery().label("prev_date"),
+                prev.with_only_columns(DailyStats.peak_concurrent_viewers)
+                    .scalar_subquery().label("prev_peak"),
+                func.avg(DailyStats.total_subscriptions).label("subs_7d"),
+                func.avg(case((recent_3d, DailyStats.total_subscriptions))).label("subs_3d"),
+                func.avg(case((recent_3d, DailyStats.avg_concurrent_viewers))).label("viewers_3d"),
+            )
+            .where(
+                DailyStats.stream_name == chan,
+                DailyStats.stream_date >= seven_days_ago,
+                DailyStats.stream_date < last.stream_date,
+            )
+        ).one()
+
+        days_since = (last.stream_date - history.prev_date).days if history.prev_date else 0
+        prev_peak = history.prev_peak if history.prev_date else last.peak_concurrent_viewers
+        day_over_day_peak_change = last.peak_concurrent_viewers - prev_peak
+
+        daily = DailyStats(
+            stream_name               = chan,
+            stream_name_lc            = chan.lower(),
+            stream_id                 = stream_id,
+            stream_date               = last.stream_date,
+            day_of_week               = last.stream_date.strftime("%A"),
+            is_weekend                = last.stream_date.weekday() >= 5,
+            is_holiday                = last.stream_date in US_HOLIDAYS,
+            stream_start_time         = last.first_start_time,
+            days_since_previous_stream= days_since,
+            stream_duration           = last.stream_duration,
+            avg_concurrent_viewers    = last.avg_concurrent_viewers,
+            peak_concurrent_viewers   = last.peak_concurrent_viewers,
+            unique_viewers            = last.unique_viewers,
+            viewer_growth_rate        = last.viewer_growth_rate,
+            total_num_chats           = last.total_num_chats,
+            total_chatters            = last.total_chatters,
+            chat_msgs_per_minute      = last.chat_msgs_per_minute,
+            total_emotes_used         = last.total_emotes_used,
+            unique_emotes_used        = last.unique_emotes_used,
+            followers_start           = last.first_followers_start,
+            followers_end             = last.followers_end,
+            net_follower_change       = last.net_follower_change,
+            total_subscriptions       = last.total_subscriptions,
+            new_subscriptions_t1      = last.new_subscriptions_t1,
+            new_subscriptions_t2_t3   = last.new_subscriptions_t2_t3,
+            resubscriptions           = last.resubscriptions,
+            gifted_subs_received      = last.gifted_subs_received,
+            gifted_subs_given         = last.gifted_subs_given,
+            subscription_cancellations= last.subscription_cancellations,
+            bits_donated              = last.bits_donated,
+            donation_events_count     = last.donation_events_count,
+            total_donation_amount     = last.total_donation_amount,
+            raids_received            = last.raids_received,
+            raid_viewers_received     = last.raid_viewers_received,
+            polls_run                 = last.polls_run,
+            poll_participation        = last.poll_participation,
+            predictions_run           = last.predictions_run,
+            prediction_participants   = last.prediction_participants,
+            game_category             = last.game_category,
+            category_changes          = last.category_changes,
+            title_length              = last.title_length,
+            has_giveaway              = last.has_giveaway,
+            has_qna                   = last.has_qna,
+            tags                      = last.tags,
+            moderation_actions        = last.moderation_actions,
+            messages_deleted          = last.messages_deleted,
+            timeouts_bans             = last.timeouts_bans,
+            avg_sentiment_score       = float(last.sentiment_avg) if last.sentiment_avg is not None else None,
+            min_sentiment_score       = last.sentiment_min,
+            max_sentiment_score       = last.sentiment_max,
+            positive_negative_ratio   = last.positive_negative_ratio,
+            subs_per_avg_viewer       = last.subs_per_avg_viewer,
+            chat_msgs_per_viewer      = last.chat_msgs_per_viewer,
+            subs_7d_moving_avg        = float(history.subs_7d) if history.subs_7d is not None else None,
+            subs_3d_moving_avg        = float(history.subs_3d) if history.subs_3d is not None else None,
+            viewers_3d_moving_avg     = float(history.viewers_3d) if history.viewers_3d is not None else None,
+            day_over_day_peak_change  = day_over_day_peak_change,
+            gift_subs_bool            = last.gift_subs_bool,
+        )
+        # Validate required (non-nullable) fields before committing
+        required_cols = [
+            c.name for c in DailyStats.__table__.columns
+            if not c.nullable and not c.primary_key
+        ]
+        missing = [col for col in required_cols if getattr(daily, col) is None]
+        if missing:
+            print(f"[Stream session for {chan}] missing data for: {', '.join(missing)}. Stats not committed.")
+        else:
+            try:
+                # the session is done with its checkpointed draft
+                session.execute(delete(StreamState).where(StreamState.stream_name == chan))
+                # Keep whichever row appears to be the most complete session summary.
+                # This prevents duplicate (stream_name, stream_date, stream_start_time) rows when
+                # the end-of-stream handler runs more than once (disconnect/reconnect, etc.).
+                row_id = self._upsert_daily(session, {
+                    col.name: getattr(daily, col.name)
+                    for col in DailyStats.__table__.columns
+                    if not col.primary_key and col.server_default is None
+                })
+                if row_id is None:
+                    msg = (f"[Stream session for {chan}] daily_stats already present; "
+                           f"keeping it, new duration={daily.stream_duration} is not longer")
+                else:
+                    msg = f"[Stream session for {chan}] stats committed to DB (id={row_id})"
+                session.commit()
+                print(msg)
+            except Exception as e:
+                session.rollback()
+                print(f"[Stream session for {chan}] commit failed: {e}")
+                if isinstance(e, OperationalError):
+                    raise           # transient – let the db dependency retry it
+        return True
+
+    @staticmethod
+    def _upsert_daily(session, values: dict) -> int | None:
+        """Insert one session's DailyStats row, or overwrite the stored one
+        for the same (stream_name, stream_date, stream_start_time) if this
+        one ran longer. Returns the row id, or None if the stored row was kept.
+        """
+        stmt = dialect_insert(session, DailyStats).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=DAILY_SESSION_KEY,
+            set_={
+                **{k: stmt.excluded[k] for k in values if k not in DAILY_SESSION_KEY},
+                # a re-run that lost the stream id keeps the stored one
+                "stream_id": func.coalesce(stmt.excluded.stream_id, DailyStats.stream_id),
+            },
+            where=stmt.excluded.stream_duration > DailyStats.stream_duration,
+        ).returning(DailyStats.id)
+        return session.execute(stmt).scalar()
 
     # ─────────────────────────  LIVE STREAM  ───────────────────────────────
     async def live_stream_data(self, chan: str):
@@ -728,96 +1076,86 @@ class StatsBot(commands.Bot):
         sentiment_score = stats.get('avg_sentiment_score', 0.5)
         pos_neg_ratio   = stats.get("positive_negative_ratio")
 
-        # ── 8) Build & commit the interval snapshot ─────────────────────
-        from main import app
-
-        with app.app_context():
-            # ── 7) Static fields & previous‐row lookup ───────────────────────
-            row_date = stats["stream_date"]
-            last_row = TimeSeries.query\
-                        .filter_by(stream_name=chan)\
-                        .order_by(TimeSeries.id.desc())\
-                        .first()
-            days_prev = (row_date - last_row.stream_date).days if last_row else 0
-            now_est = now.replace(tzinfo=pytz.utc).astimezone(EST)
-            naive_now_est = now_est.replace(tzinfo=None)
-
-
-            row = TimeSeries(
-                stream_name               = chan,
-                snapshot_time             = naive_now_est,
-                stream_date               = row_date,
-                day_of_week               = row_date.strftime("%A"),
-                is_weekend                = row_date.weekday() >= 5,
-                is_holiday                = row_date in US_HOLIDAYS,
-                stream_start_time         = stats["start_time"].time(),
-                days_since_previous_stream= days_prev,
-                stream_duration           = stats["stream_duration"],
-
-                avg_concurrent_viewers    = stats["avg_concurrent_viewers"],
-                peak_concurrent_viewers   = stats["peak_concurrent_viewers"],
-                unique_viewers            = stats["unique_viewers"],
-                viewer_growth_rate        = stats["viewer_growth_rate"],
-
-                total_num_chats           = stats["total_num_chats"],
-                total_chatters            = stats["total_chatters"],
-                chat_msgs_per_minute      = stats["chat_msgs_per_minute"],
-
-                total_emotes_used         = stats["total_emotes_used"],
-                unique_emotes_used        = stats["unique_emotes_used"],
-
-                followers_start           = stats["followers_start"],
-                followers_end             = stats["followers_end"],
-                net_follower_change       = stats["net_follower_change"],
-
-                total_subscriptions       = stats["total_subscriptions"],
-                new_subscriptions_t1      = stats["new_subscriptions_t1"],
-                new_subscriptions_t2_t3   = stats["new_subscriptions_t2_t3"],
-                resubscriptions           = stats["resubscriptions"],
-                gifted_subs_received      = stats["gifted_subs_received"],
-                gifted_subs_given         = stats["gifted_subs_given"],
-                subscription_cancellations= stats["subscription_cancellations"],
-
-                bits_donated              = stats["bits_donated"],
-                donation_events_count     = stats["donation_events_count"],
-                total_donation_amount     = stats["total_donation_amount"],
-
-                raids_received            = stats["raids_received"],
-                raid_viewers_received     = stats["raid_viewers_received"],
-
-                polls_run                 = stats["polls_run"],
-                poll_participation        = stats["poll_participation"],
-                predictions_run           = stats["predictions_run"],
-                prediction_participants   = stats["prediction_participants"],
-
-                game_category             = stats["game_category"] or "Unknown",
-                category_changes          = stats["category_changes"],
-                title_length              = stats["title_length"],
-                has_giveaway              = stats["has_giveaway"],
-                has_qna                   = stats["has_qna"],
-                tags                      = stats["tags"],
-
-                moderation_actions        = stats["moderation_actions"],
-                messages_deleted          = stats["messages_deleted"],
-                timeouts_bans             = stats["timeouts_bans"],
-
-                avg_sentiment_score       = sentiment_score,
-                positive_negative_ratio   = pos_neg_ratio,
-
-                subs_per_avg_viewer       = stats["subs_per_avg_viewer"],
-                chat_msgs_per_viewer      = stats["chat_msgs_per_viewer"],
-
-                subs_7d_moving_avg        = None,
-                subs_3d_moving_avg        = None,
-                viewers_3d_moving_avg     = None,
-                day_over_day_peak_change  = None,
-
-                gift_subs_bool            = stats["gift_subs_bool"],
-            )
-            db.session.add(row)
-            db.session.commit()
-            # print(f"[{chan}] stats committed to DB")
+        # ── 7) Build the interval snapshot ───────────────────────────────
+        row_date = stats["stream_date"]
+        fields = dict(
+            stream_name               = chan,
+            stream_id                 = stats["stream_id"],
+            snapshot_time             = now_est.replace(tzinfo=None),
+            stream_date               = row_date,
+            day_of_week               = row_date.strftime("%A"),
+            is_weekend                = row_date.weekday() >= 5,
+            is_holiday                = row_date in US_HOLIDAYS,
+            stream_start_time         = stats["start_time"].time(),
+            days_since_previous_stream= None,             # set when the batch is written
+            stream_duration           = stats["stream_duration"],
+
+            avg_concurrent_viewers    = stats["avg_concurrent_viewers"],
+            peak_concurrent_viewers   = stats["peak_concurrent_viewers"],
+            unique_viewers            = stats["unique_viewers"],
+            viewer_growth_rate        = stats["viewer_growth_rate"],
+
+            total_num_chats           = stats["total_num_chats"],
+            total_chatters            = stats["total_chatters"],
+            chat_msgs_per_minute      = stats["chat_msgs_per_minute"],
+
+            total_emotes_used         = stats["total_emotes_used"],
+            unique_emotes_used        = stats["unique_emotes_used"],
+
+            followers_start           = stats["followers_start"],
+            followers_end             = stats["followers_end"],
+            net_follower_change       = stats["net_follower_change"],
+
+            total_subscriptions       = stats["total_subscriptions"],
+            new_subscriptions_t1      = stats["new_subscriptions_t1"],
+            new_subscriptions_t2_t3   = stats["new_subscriptions_t2_t3"],
+            resubscriptions           = stats["resubscriptions"],
+            gifted_subs_received      = stats["gifted_subs_received"],
+            gifted_subs_given         = stats["gifted_subs_given"],
+            subscription_cancellations= stats["subscription_cancellations"],
+
+            bits_donated              = stats["bits_donated"],
+            donation_events_count     = stats["donation_events_count"],
+            total_donation_amount     = stats["total_donation_amount"],
+
+            raids_received            = stats["raids_received"],
+            raid_viewers_received     = stats["raid_viewers_received"],
+
+            polls_run                 = stats["polls_run"],
+            poll_participation        = stats["poll_participation"],
+            predictions_run           = stats["predictions_run"],
+            prediction_participants   = stats["prediction_participants"],
+
+            game_category             = stats["game_category"] or "Unknown",
+            category_changes          = stats["category_changes"],
+            title_length              = stats["title_length"],
+            has_giveaway              = stats["has_giveaway"],
+            has_qna                   = stats["has_qna"],
+            tags                      = stats["tags"],
+
+            moderation_actions        = stats["moderation_actions"],
+            messages_deleted          = stats["messages_deleted"],
+            timeouts_bans             = stats["timeouts_bans"],
+
+            avg_sentiment_score       = sentiment_score,
+            positive_negative_ratio   = pos_neg_ratio,
+
+            subs_per_avg_viewer       = stats["subs_per_avg_viewer"],
+            chat_msgs_per_viewer      = stats["chat_msgs_per_viewer"],
+
+            subs_7d_moving_avg        = None,
+            subs_3d_moving_avg        = None,
+            viewers_3d_moving_avg     = None,
+            day_over_day_peak_change  = None,
+
+            gift_subs_bool            = stats["gift_subs_bool"],
+        )
 
+        # ── 8) Queue it; SnapshotWriter commits the whole batch at once
+        #       (and skips it if nothing but the duration moved) ──
+        # the draft only counts stored rows, like the _scan_session fallback
+        if self.snapshots.add(fields):
+            self.drafts.update(fields)
 
 
     # ──────────────────────  CHAT / EVENT HANDLERS  ─────────────────────────
@@ -987,6 +1325,22 @@ class StatsBot(commands.Bot):
             print(f"[{chan}] sentiment analysis crashed: {type(e).__name__}: {e}")
             return 0.5
     # ─────────────────────────  CLEANUP  ──────────────────────────────────
+    async def close(self):
+        # stop producing snapshots and write the buffered ones before anything
+        # else, so a slow IRC shutdown can't cost the last minute of data
+        self.metrics_collector.cancel()
+        await self.retention.close()
+        await self.snapshots.close()
+        await self.drafts.close()
+        try:
+            await super().close()
+        finally:
+            # release the pooled HTTP connections even if the IRC close fails
+            self.meta.close()
+            await self.eventsub.close()
+            await self.helix.close()
+            self.botdb.close()
+
     def __del__(self):
         try:
             self.metrics_collector.cancel()
@@ -995,13 +1349,17 @@ class StatsBot(commands.Bot):
 
 
     async def openai_model_calls(self, model, messages, max_tokens=30, temperature=0.8):
+        # the client is synchronous: run it in a thread under the openai
+        # timeout / retry / circuit breaker instead of blocking the loop
         if model == 'o3-mini':
-            response = self.client.chat.completions.create(
+            response = await self.deps['openai'].run(
+                self.client.chat.completions.create,
                 model=model,
                 messages=messages
             )
         else:
-            response = self.client.chat.completions.create(
+            response = await self.deps['openai'].run(
+                self.client.chat.completions.create,
                 model=model,
                 messages=messages,
                 max_tokens=max_tokens,
@@ -1014,9 +1372,7 @@ class StatsBot(commands.Bot):
         save_freq = 60 * 5
         if current_time_ - self.last_ping_time >= save_freq:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get('https://darksharkstatscollect-a6c60b29865d.herokuapp.com') as resp:
-                        await resp.text()
+                await self.helix.ping('https://darksharkstatscollect-a6c60b29865d.herokuapp.com')
                 self.last_ping_time = current_time_
             except Exception as e:
                 print(f"Error while sending keep-alive ping: {e}")
@@ -0,0 +1,169 @@
+# stream_drafts.py
+# Running DailyStats draft for every live session. Each snapshot the bot
+# stores is folded into its channel's draft (the session's first values, the
+# latest counters, the sentiment min / avg / max), so the end-of-stream
+# rollup finalises one row from memory instead of reading the session's
+# snapshots back. Rows the snapshot writer skips as unchanged are left out
+# here too, so the draft and that read-back agree. Drafts are checkpointed
+# to the stream_state table so a restart mid-stream carries on from where
+# it left off.
+
+import os, time, asyncio
+from datetime import date, time as dtime
+from types import SimpleNamespace
+
+from models import StreamState
+
+DRAFT_CHECKPOINT_INTERVAL = float(os.getenv("DRAFT_CHECKPOINT_INTERVAL", 300))   # seconds
+
+# snapshot columns that say nothing about the session as a whole
+_SKIP = ("snapshot_time", "days_since_previous_stream")
+
+
+def _session_key(draft: dict) -> tuple:
+    return draft["last"]["stream_date"], draft["last"]["stream_start_time"]
+
+
+def _encode(draft: dict) -> dict:
+    """JSON-safe copy of *draft* for stream_state.payload."""
+    last = dict(draft["last"],
+                stream_date=draft["last"]["stream_date"].isoformat(),
+                stream_start_time=draft["last"]["stream_start_time"].isoformat())
+    return dict(draft, last=last, first_start_time=draft["first_start_time"].isoformat())
+
+
+def _decode(payload: dict) -> dict:
+    last = dict(payload["last"],
+                stream_date=date.fromisoformat(payload["last"]["stream_date"]),
+                stream_start_time=dtime.fromisoformat(payload["last"]["stream_start_time"]))
+    return dict(payload, last=last, first_start_time=dtime.fromisoformat(payload["first_start_time"]))
+
+
+class StreamDrafts:
+    """Per-channel session drafts, keyed by stream_name.
+
+    ``update(fields)`` folds one snapshot (the column dict handed to the
+    SnapshotWriter) into its channel's draft; a snapshot from a different
+    session (stream_date / stream_start_time) starts a new draft.
+    ``summary(chan)`` returns what the rollup needs, with the same attribute
+    names as the TimeSeries-based fallback query in StatsBot.
+
+    Changed drafts are written to stream_state at most every
+    DRAFT_CHECKPOINT_INTERVAL seconds (and on ``close()``); ``restore()``
+    reads them back when a session is rehydrated after a restart.
+    """
+
+    def __init__(self, botdb, checkpoint_interval: float = DRAFT_CHECKPOINT_INTERVAL):
+        self.botdb               = botdb
+        self.checkpoint_interval = checkpoint_interval
+        self.drafts:        dict[str, dict] = {}
+        self._dirty:        set[str] = set()
+        self._checkpointed  = time.monotonic()
+        self._lock          = asyncio.Lock()
+        self._task:         asyncio.Task | None = None
+
+    def __contains__(self, chan: str) -> bool:
+        return chan in self.drafts
+
+    def update(self, fields: dict):
+        chan  = fields["stream_name"]
+        last  = {k: v for k, v in fields.items() if k not in _SKIP}
+        draft = self.drafts.get(chan)
+        if draft is None or _session_key(draft) != (last["stream_date"], last["stream_start_time"]):
+            draft = self.drafts[chan] = {
+                "first_start_time":      last["stream_start_time"],
+                "first_followers_start": last["followers_start"],
+                "sentiment_sum":         0.0,
+                "sentiment_count":       0,
+                "sentiment_min":         None,
+                "sentiment_max":         None,
+            }
+        draft["last"] = last
+
+        score = last["avg_sentiment_score"]
+        if score is not None:
+            draft["sentiment_sum"]   += score
+            draft["sentiment_count"] += 1
+            draft["sentiment_min"] = score if draft["sentiment_min"] is None else min(draft["sentiment_min"], score)
+            draft["sentiment_max"] = score if draft["sentiment_max"] is None else max(draft["sentiment_max"], score)
+
+        self._dirty.add(chan)
+        if (time.monotonic() - self._checkpointed >= self.checkpoint_interval
+                and (self._task is None or self._task.done())):
+            self._task = asyncio.create_task(self.checkpoint())
+
+    def summary(self, chan: str) -> SimpleNamespace | None:
+        """The finished session for the rollup, or None if there is no draft.
+
+        The draft stays until ``discard()`` (so a failed rollup can be
+        retried) but is no longer checkpointed.
+        """
+        draft = self.drafts.get(chan)
+        if draft is None:
+            return None
+        self._dirty.discard(chan)
+        n = draft["sentiment_count"]
+        return SimpleNamespace(
+            **draft["last"],
+            first_start_time      = draft["first_start_time"],
+            first_followers_start = draft["first_followers_start"],
+            sentiment_avg         = draft["sentiment_sum"] / n if n else None,
+            sentiment_min         = draft["sentiment_min"],
+            sentiment_max         = draft["sentiment_max"],
+        )
+
+    def discard(self, chan: str):
+        self.drafts.pop(chan, None)
+        self._dirty.discard(chan)
+
+    async def restore(self, sessions: dict[str, tuple[date, dtime]]):
+        """Load checkpointed drafts for {chan: (stream_date, stream_start_time)},
+        keeping only those that belong to that session."""
+        sessions = {c: k for c, k in sessions.items() if c not in self.drafts}
+        if not sessions:
+            return
+        try:
+            payloads = await self.botdb.run(self._load, list(sessions))
+        except Exception as e:
+            print(f"[drafts] restore failed: {type(e).__name__}: {e}")
+            return
+        for chan, payload in payloads.items():
+            try:
+                draft = _decode(payload)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if _session_key(draft) == sessions[chan]:
+                self.drafts[chan] = draft
+                print(f"[{chan}] session draft restored")
+
+    async def checkpoint(self):
+        async with self._lock:
+            self._checkpointed = time.monotonic()
+            dirty, self._dirty = self._dirty, set()
+            payloads = {c: _encode(self.drafts[c]) for c in dirty if c in self.drafts}
+            if not payloads:
+                return
+            try:
+                await self.botdb.run(self._save, payloads)
+            except Exception as e:
+                print(f"[drafts] checkpoint of {len(payloads)} draft(s) failed: {type(e).__name__}: {e}")
+                self._dirty |= payloads.keys() & self.drafts.keys()
+
+    async def close(self):
+        """Wait for a running checkpoint, then write every changed draft."""
+        if self._task is not None and not self._task.done():
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.checkpoint()
+
+    # ─────────────────────────  DB SIDE (worker thread)  ───────────────────
+    @staticmethod
+    def _load(session, chans: list[str]) -> dict[str, dict]:
+        rows = session.query(StreamState).filter(StreamState.stream_name.in_(chans)).all()
+        return {r.stream_name: r.payload for r in rows}
+
+    @staticmethod
+    def _save(session, payloads: dict[str, dict]):
+        for chan, payload in payloads.items():
+            session.merge(StreamState(stream_name=chan, payload=payload))
+        session.commit()
@@ -0,0 +1,23 @@
+from poll_scheduler import ChannelScheduler
+
+
+def test_channel_due_while_parted_is_polled_after_rejoin():
+    sched = ChannelScheduler(live_interval=60)
+    sched.add("foo", delay=-1)
+    sched.add("bar", delay=-1)
+
+    # "foo" falls due while it is missing from the joined channels
+    assert sched.pop_due(watched={"bar"}) == ["bar"]
+    assert "foo" not in sched
+
+    # once it is joined again, add() schedules it afresh
+    sched.add("foo", delay=-1)
+    assert sched.pop_due(watched={"foo", "bar"}) == ["foo"]
+
+
+def test_pop_due_without_watched_returns_every_due_channel():
+    sched = ChannelScheduler(live_interval=60)
+    sched.add("foo", delay=-1)
+    sched.add("bar", delay=3600)
+    assert sched.pop_due() == ["foo"]
+    assert "foo" in sched